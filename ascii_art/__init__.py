@@ -0,0 +1,7 @@
+from .converter import ArtConverter, COLOR_CHARS, GRAY_CHARS
+from .pipeline import FramePipeline, convert_video
+from .quantizer import ColorQuantizer
+from .renderers import AsciiRenderer, PixelRenderer
+from .sampler import CellSampler
+from .sinks import FFmpegSink, ImageSink, VideoSink, open_sink
+from .sources import ImageSource, VideoSource, open_source
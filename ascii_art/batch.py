@@ -0,0 +1,157 @@
+import functools
+import json
+import glob
+import time
+import cv2
+import os
+
+from .cache import get_file_hash
+from .files import open_temp_path
+from .pool import call_shared, open_fork_pool
+from .sources import is_image_path
+
+
+SKIP_MODES = ('none', 'mtime', 'hash')
+MANIFEST_NAME = 'manifest.json'
+
+
+def find_images(input_path):
+    # a directory is searched recursively, anything else is a glob pattern; outputs mirror the paths under root
+    if os.path.isdir(input_path):
+        root = input_path
+        paths = [os.path.join(folder, name) for folder, _, names in os.walk(root) for name in names]
+    else:
+        paths = glob.glob(input_path, recursive=True)
+        root = os.path.commonpath([os.path.dirname(path) for path in paths]) if paths else ''
+    return root, sorted(path for path in paths if is_image_path(path))
+
+
+def load_manifest(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(manifest, path):
+    # written aside and renamed, so an interrupted run never leaves half a manifest behind
+    with open_temp_path(path) as temp_path, open(temp_path, 'w') as file:
+        json.dump(manifest, file, indent=2)
+
+
+class BatchConversion:
+
+    def __init__(self, create_converter, skip='mtime', converter_cache_size=16, cache=None, settings=None,
+                 controller=None):
+        if skip not in SKIP_MODES:
+            raise ValueError(f'skip must be one of {SKIP_MODES}, not {skip!r}')
+        self.skip = skip
+        self.cache = cache
+        self.settings = settings or {}
+        # converters depend on the frame size, and folders of product photos share a handful of sizes
+        self.get_converter = functools.lru_cache(maxsize=converter_cache_size)(create_converter)
+        # a ResolutionController picks the converter for each image instead, and learns from its time
+        self.controller = controller
+        if controller is not None:
+            self.get_converter = controller.get_converter
+
+    def is_up_to_date(self, input_path, output_path, entry, previous):
+        if self.skip == 'none' or previous is None or previous.get('status') == 'failed' or \
+                not os.path.exists(output_path):
+            return False
+        if self.skip == 'hash':
+            return previous.get('sha1') == entry['sha1']
+        return os.path.getmtime(output_path) >= os.path.getmtime(input_path)
+
+    def convert_image(self, task):
+        input_path, output_path, previous = task
+        start_time = time.perf_counter()
+        entry = {'input': input_path, 'output': output_path}
+        try:
+            entry['mtime_ns'] = os.stat(input_path).st_mtime_ns
+            if self.skip == 'hash' or self.cache is not None:
+                entry['sha1'] = get_file_hash(input_path)
+            if self.is_up_to_date(input_path, output_path, entry, previous):
+                entry['status'] = 'skipped'
+                return entry
+            if self.cache is not None:
+                key = self.cache.get_key(entry['sha1'], self.settings)
+                if self.cache.get(key, output_path):
+                    entry['status'] = 'cached'
+                    entry['seconds'] = time.perf_counter() - start_time
+                    return entry
+            image = cv2.imread(input_path)
+            if image is None:
+                raise OSError(f'cannot read image {input_path!r}')
+            converter = self.get_converter((image.shape[1], image.shape[0]))
+            convert_start = time.perf_counter()
+            frame = converter.convert_frame(image)
+            if self.controller is not None:
+                self.controller.update(time.perf_counter() - convert_start, converter.screen_size)
+                entry['frame_size'] = list(converter.screen_size)
+            # imwrite picks the format from the extension, so the temporary name keeps it
+            os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+            with open_temp_path(output_path, keep_extension=True) as temp_path:
+                if not cv2.imwrite(temp_path, frame):
+                    raise OSError(f'cannot write image {output_path!r}')
+            if self.cache is not None:
+                self.cache.put(key, output_path)
+            entry['status'] = 'converted'
+        except Exception as error:
+            entry['status'] = 'failed'
+            entry['error'] = f'{type(error).__name__}: {error}'
+        entry['seconds'] = time.perf_counter() - start_time
+        return entry
+
+    def run(self, tasks, workers=1):
+        if workers <= 1:
+            yield from map(self.convert_image, tasks)
+            return
+
+        # the workers inherit the converter factory; images are small and many, so they are dealt out in chunks
+        # and collected in whatever order they finish
+        with open_fork_pool(self, workers) as pool:
+            yield from pool.imap_unordered(functools.partial(call_shared, 'convert_image'), tasks, chunksize=8)
+            pool.close()
+            pool.join()
+
+
+def convert_batch(input_path, output_dir, create_converter, settings, workers=1, skip='mtime', extension=None,
+                  manifest_path=None, progress=None, cache=None, controller=None):
+    root, paths = find_images(input_path)
+    manifest_path = manifest_path or os.path.join(output_dir, MANIFEST_NAME)
+    previous_manifest = load_manifest(manifest_path)
+    # outputs made with other settings are never up to date
+    if previous_manifest is None or previous_manifest.get('settings') != settings:
+        previous_entries = {}
+    else:
+        previous_entries = {entry['input']: entry for entry in previous_manifest.get('files', [])}
+
+    tasks = []
+    for path in paths:
+        output_path = os.path.join(output_dir, os.path.relpath(path, root))
+        if extension:
+            output_path = f"{os.path.splitext(output_path)[0]}.{extension.lstrip('.')}"
+        tasks.append((path, output_path, previous_entries.get(path)))
+
+    entries = {}
+    start_time = time.perf_counter()
+    try:
+        batch_conversion = BatchConversion(create_converter, skip, cache=cache, settings=settings,
+                                           controller=controller)
+        for entry in batch_conversion.run(tasks, workers):
+            entries[entry['input']] = entry
+            if progress is not None:
+                progress(entry)
+    finally:
+        # an interrupted batch keeps what it knew about the images it did not reach, so a rerun can skip them
+        files = [entries.get(path) or previous_entries.get(path) for path, _, _ in tasks]
+        files = [entry for entry in files if entry is not None]
+        counts = {status: sum(entry['status'] == status for entry in entries.values())
+                  for status in ('converted', 'cached', 'skipped', 'failed')}
+        manifest = {'settings': settings, 'input': input_path, 'images': len(tasks), **counts,
+                    'seconds': time.perf_counter() - start_time, 'files': files}
+        os.makedirs(os.path.dirname(manifest_path) or '.', exist_ok=True)
+        save_manifest(manifest, manifest_path)
+    return manifest
@@ -0,0 +1,216 @@
+import numpy as np
+import subprocess
+import itertools
+import platform
+import tempfile
+import json
+import time
+import cv2
+import sys
+import os
+
+from .cases import COLOR_LVLS, FONT_SIZES, INPUTS, PIXEL_SIZES, RESOLUTIONS
+from .converter import ArtConverter, COLORS, MODES
+from .sinks import ImageSink, VideoSink
+from .sources import ImageSource, VideoSource
+
+
+STAGES = ('decode', 'convert', 'render', 'encode')
+TEST_FPS = 25
+# numpy and cv2 are what any conversion needs, the rest should only load with the mode that uses it
+IMPORT_TARGETS = ('numpy, cv2', 'ascii_art', 'ascii_art.cli')
+HEAVY_MODULES = ('pygame', 'numba', 'ffpyplayer', 'multiprocessing.shared_memory')
+IMPORT_SCRIPT = """
+import time, sys
+start_time = time.perf_counter()
+import {target}
+print(time.perf_counter() - start_time)
+print(' '.join(name for name in {heavy_modules!r} if name in sys.modules))
+"""
+
+
+def create_test_frame(frame_size, index, seed=0):
+    # gradients, a moving disc and seeded noise: every frame differs, but every run sees the same frames
+    width, height = frame_size
+    xs = np.linspace(0, 255, width, dtype=np.float32)[None, :]
+    ys = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:, :, 0] = (xs + index * 4) % 256
+    frame[:, :, 1] = ys
+    frame[:, :, 2] = (xs + ys + index * 8) % 256
+    center = (index * width // 40) % width, height // 2
+    cv2.circle(frame, center, height // 4, (255, 255, 255), -1)
+    rng = np.random.default_rng(seed + index)
+    noise = rng.integers(0, 32, size=(height, width, 1), dtype=np.uint8)
+    return cv2.add(frame, np.broadcast_to(noise, frame.shape).copy())
+
+
+def create_test_inputs(directory, frame_size, frame_count):
+    image_path = os.path.join(directory, 'test.png')
+    cv2.imwrite(image_path, create_test_frame(frame_size, 0))
+    video_path = os.path.join(directory, 'test.mp4')
+    sink = VideoSink(video_path, TEST_FPS, frame_size)
+    for index in range(frame_count):
+        sink.write(create_test_frame(frame_size, index))
+    sink.release()
+    return {'image': image_path, 'video': video_path}
+
+
+def get_cases(resolutions, inputs, modes, colors, font_sizes, pixel_sizes, color_lvls, backends=('numpy',),
+              samplings=('point',)):
+    for resolution, input_kind, mode, color, backend, sampling in itertools.product(resolutions, inputs, modes,
+                                                                                   colors, backends, samplings):
+        sizes = font_sizes if mode == 'ascii' else pixel_sizes
+        for size, color_lvl in itertools.product(sizes, color_lvls if color == 'rgb' else (None,)):
+            case = {'resolution': resolution, 'input': input_kind, 'mode': mode, 'color': color,
+                    'backend': backend, 'sampling': sampling}
+            case['font_size' if mode == 'ascii' else 'pixel_size'] = size
+            case['color_lvl'] = color_lvl
+            yield case
+
+
+def get_case_key(case):
+    return tuple(case.get(name) for name in ('resolution', 'input', 'mode', 'color', 'backend', 'sampling',
+                                             'font_size', 'pixel_size', 'color_lvl'))
+
+
+def time_frame(converter, read_frame, write_frame, frame, timings):
+    start_time = time.perf_counter()
+    cv2_image = read_frame()
+    decode_time = time.perf_counter()
+    if cv2_image is None:
+        return None
+    cells = converter.get_cells(cv2_image)
+    convert_time = time.perf_counter()
+    converter.render_cells(cells, frame)
+    render_time = time.perf_counter()
+    write_frame(frame)
+    encode_time = time.perf_counter()
+    timings['decode'].append(decode_time - start_time)
+    timings['convert'].append(convert_time - decode_time)
+    timings['render'].append(render_time - convert_time)
+    timings['encode'].append(encode_time - render_time)
+    return cv2_image
+
+
+def run_case(case, input_path, output_dir, frame_count):
+    frame_size = RESOLUTIONS[case['resolution']]
+    start_time = time.perf_counter()
+    converter = ArtConverter(frame_size, mode=case['mode'], color=case['color'],
+                             font_size=case.get('font_size') or 12, pixel_size=case.get('pixel_size') or 7,
+                             color_lvl=case['color_lvl'] or 8, backend=case['backend'], sampling=case['sampling'])
+    setup_time = time.perf_counter() - start_time
+    frame = converter.create_frame()
+    timings = {stage: [] for stage in STAGES}
+
+    if case['input'] == 'video':
+        source = VideoSource(input_path)
+        sink = VideoSink(os.path.join(output_dir, 'out.mp4'), source.fps, frame_size)
+        cv2_image = None
+        try:
+            for _ in range(frame_count):
+                cv2_image = time_frame(converter, lambda: source.read(cv2_image), sink.write, frame, timings)
+                if cv2_image is None:
+                    break
+        finally:
+            sink.release()
+            source.release()
+    else:
+        # a still image is one decode and one encode, so every repetition opens and writes the file again
+        sink = ImageSink(os.path.join(output_dir, 'out.png'))
+        for _ in range(frame_count):
+            time_frame(converter, lambda: ImageSource(input_path).read(), sink.write, frame, timings)
+
+    frames = len(timings['decode'])
+    total_time = sum(map(sum, timings.values()))
+    stages = {stage: {'total_s': sum(times), 'mean_ms': 1000 * sum(times) / max(frames, 1),
+                      'max_ms': 1000 * max(times, default=0)} for stage, times in timings.items()}
+    return dict(case, frames=frames, setup_s=setup_time, stages=stages,
+                fps=frames / total_time if total_time else 0.0)
+
+
+def get_environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(),
+            'cpu_count': os.cpu_count(), 'numpy': np.__version__, 'opencv': cv2.__version__}
+
+
+def time_import(target, repeat=5):
+    # every sample is a fresh interpreter, so nothing is imported yet
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (package_dir, os.environ.get('PYTHONPATH')))))
+    script = IMPORT_SCRIPT.format(target=target, heavy_modules=HEAVY_MODULES)
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, env=env,
+                                check=True).stdout.splitlines()
+        times.append(float(output[0]))
+    return {'import': target, 'median_ms': 1000 * float(np.median(times)), 'min_ms': 1000 * min(times),
+            'heavy_modules': output[1].split()}
+
+
+def run_import_benchmarks(targets=IMPORT_TARGETS, repeat=5, progress=None):
+    results = []
+    for target in targets:
+        result = time_import(target, repeat)
+        results.append(result)
+        if progress is not None:
+            progress(result)
+    return {'environment': get_environment(), 'imports': results}
+
+
+def run_benchmarks(resolutions=tuple(RESOLUTIONS), inputs=INPUTS, modes=MODES, colors=COLORS,
+                   font_sizes=FONT_SIZES, pixel_sizes=PIXEL_SIZES, color_lvls=COLOR_LVLS, frame_count=10,
+                   progress=None, backends=('numpy',), samplings=('point',)):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        input_paths = {}
+        for case in get_cases(resolutions, inputs, modes, colors, font_sizes, pixel_sizes, color_lvls, backends,
+                              samplings):
+            resolution = case['resolution']
+            if resolution not in input_paths:
+                input_dir = os.path.join(directory, resolution)
+                os.makedirs(input_dir)
+                input_paths[resolution] = create_test_inputs(input_dir, RESOLUTIONS[resolution], frame_count)
+            result = run_case(case, input_paths[resolution][case['input']], directory, frame_count)
+            results.append(result)
+            if progress is not None:
+                progress(result)
+    return {'environment': get_environment(), 'results': results}
+
+
+def compare_results(baseline, report, tolerance=0.1):
+    # a case regresses when its fps dropped, or an import slowed down, by more than tolerance relative to the
+    # baseline run; an import that starts loading a heavy module regresses regardless of time
+    baseline_fps = {get_case_key(result): result['fps'] for result in baseline.get('results', ())}
+    regressions = []
+    for result in report.get('results', ()):
+        old_fps = baseline_fps.get(get_case_key(result))
+        if old_fps and result['fps'] < old_fps * (1 - tolerance):
+            case = ' '.join(str(value) for value in get_case_key(result) if value is not None)
+            regressions.append(f"{case}: {old_fps:.1f} -> {result['fps']:.1f} fps")
+    baseline_imports = {result['import']: result for result in baseline.get('imports', ())}
+    for result in report.get('imports', ()):
+        old_result = baseline_imports.get(result['import'])
+        if old_result is None:
+            continue
+        if result['median_ms'] > old_result['median_ms'] * (1 + tolerance):
+            regressions.append(f"import {result['import']}: {old_result['median_ms']:.1f} -> "
+                               f"{result['median_ms']:.1f} ms")
+        for name in set(result['heavy_modules']) - set(old_result['heavy_modules']):
+            regressions.append(f"import {result['import']}: now loads {name}")
+    return regressions
+
+
+def save_report(report, path):
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2)
+
+
+def load_report(path):
+    with open(path) as file:
+        return json.load(file)
@@ -0,0 +1,110 @@
+import shutil
+import json
+import os
+
+from .files import open_temp_path
+
+
+# bump when a change to the converter alters its output, so results of older versions are never returned
+CACHE_VERSION = 2
+CACHE_DIR = os.environ.get('ASCII_ART_CACHE')
+
+
+def get_file_hash(path):
+    import hashlib
+
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(2 ** 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_fingerprint(settings):
+    # the same settings give the same fingerprint whatever order they were given in
+    return json.dumps({'version': CACHE_VERSION, **settings}, sort_keys=True, separators=(',', ':'))
+
+
+class ResultCache:
+
+    def __init__(self, cache_dir, max_bytes=2 ** 30, rescan_interval=64):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.rescan_interval = rescan_interval
+        # the size is counted once and then kept up to date with this process's writes; workers sharing the
+        # directory do not see each other's, so it is counted again every rescan_interval writes
+        self.size = None
+        self.put_count = 0
+
+    def get_key(self, input_hash, settings):
+        import hashlib
+
+        return hashlib.sha1(f'{input_hash}|{get_fingerprint(settings)}'.encode()).hexdigest()
+
+    def get_path(self, key, extension):
+        # two hex digits of fan-out keep directories small with hundreds of thousands of results
+        return os.path.join(self.cache_dir, key[:2], key + extension)
+
+    def get(self, key, output_path):
+        # a hit is copied to output_path, and its mtime marks it as recently used for eviction
+        cache_path = self.get_path(key, os.path.splitext(output_path)[1])
+        try:
+            os.utime(cache_path)
+            os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+            with open_temp_path(output_path) as temp_path:
+                shutil.copyfile(cache_path, temp_path)
+        except FileNotFoundError:
+            # missing, or evicted by another worker in between
+            return False
+        return True
+
+    def put(self, key, output_path):
+        cache_path = self.get_path(key, os.path.splitext(output_path)[1])
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # copied aside and renamed, so a concurrent reader sees either nothing or the whole result
+        with open_temp_path(cache_path) as temp_path:
+            shutil.copyfile(output_path, temp_path)
+        self.put_count += 1
+        if self.size is None or self.put_count % self.rescan_interval == 0:
+            self.size = self.get_size()
+        else:
+            self.size += os.path.getsize(cache_path)
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def get_entries(self):
+        entries = []
+        for folder in os.scandir(self.cache_dir):
+            if not folder.is_dir():
+                continue
+            for entry in os.scandir(folder.path):
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def get_size(self):
+        return sum(size for _, size, _ in self.get_entries())
+
+    def evict(self):
+        # least recently used first, down to 90% of the cap so that the next few writes do not evict again
+        entries = sorted(self.get_entries())
+        self.size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self.size <= 0.9 * self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.size -= size
+        return self.size
+
+
+def open_cache(cache_dir=None, max_bytes=2 ** 30):
+    cache_dir = cache_dir or CACHE_DIR
+    return ResultCache(cache_dir, max_bytes) if cache_dir else None
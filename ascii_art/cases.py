@@ -0,0 +1,7 @@
+# the settings the benchmark sweeps, apart from benchmark.py so that the cli can offer them as choices without
+# importing the benchmark on every command
+RESOLUTIONS = {'480p': (854, 480), '1080p': (1920, 1080), '4k': (3840, 2160)}
+INPUTS = ('image', 'video')
+FONT_SIZES = (8, 12, 16)
+PIXEL_SIZES = (4, 7, 12)
+COLOR_LVLS = (4, 8, 16)
@@ -0,0 +1,453 @@
+import argparse
+import shutil
+import time
+import sys
+import os
+
+from .batch import MANIFEST_NAME, SKIP_MODES
+from .cache import CACHE_DIR, get_file_hash, open_cache
+from .cases import COLOR_LVLS, FONT_SIZES, INPUTS, PIXEL_SIZES, RESOLUTIONS
+from .converter import ArtConverter, BACKENDS, COLORS, MODES
+from .pipeline import convert_video
+from .sampler import SAMPLINGS
+from .sinks import ENCODERS, open_sink
+from .sources import is_image_path, open_source
+from .text import TEXT_FORMATS
+
+
+def get_range_type(convert, is_valid, requirement):
+    def parse(text):
+        value = convert(text)
+        if not is_valid(value):
+            raise argparse.ArgumentTypeError(f'must be {requirement}, not {text}')
+        return value
+
+    # argparse names the type when the value is not a number at all
+    parse.__name__ = convert.__name__
+    return parse
+
+
+POSITIVE_INT = get_range_type(int, lambda value: value >= 1, 'at least 1')
+NON_NEGATIVE_INT = get_range_type(int, lambda value: value >= 0, 'at least 0')
+POSITIVE_FLOAT = get_range_type(float, lambda value: value > 0, 'more than 0')
+NON_NEGATIVE_FLOAT = get_range_type(float, lambda value: value >= 0, 'at least 0')
+# pygame draws no glyphs below font size 3
+FONT_SIZE = get_range_type(int, lambda value: value >= 3, 'at least 3')
+COLOR_LVL = get_range_type(int, lambda value: 2 <= value <= 256, 'between 2 and 256')
+CRF = get_range_type(int, lambda value: 0 <= value <= 51, 'between 0 and 51')
+
+
+def add_converter_arguments(parser):
+    parser.add_argument('--mode', choices=MODES, default='ascii')
+    parser.add_argument('--color', choices=COLORS, default='rgb')
+    parser.add_argument('--font-size', type=FONT_SIZE, default=12)
+    parser.add_argument('--pixel-size', type=POSITIVE_INT, default=7)
+    parser.add_argument('--color-lvl', type=COLOR_LVL, default=8)
+    parser.add_argument('--chars', help='characters from darkest to brightest (ascii mode)')
+    parser.add_argument('--gamma', type=POSITIVE_FLOAT, default=1.0,
+                        help='curve applied to brightness before picking characters, below 1 uses denser ones '
+                             '(ascii mode)')
+    parser.add_argument('--sampling', choices=SAMPLINGS, default='point',
+                        help='area averages every pixel of a cell instead of taking its top left one, which stops '
+                             'flicker on video and allows larger cells')
+    parser.add_argument('--backend', choices=BACKENDS, default='numpy',
+                        help='numba renders with compiled kernels into reused buffers (pip install .[numba])')
+
+
+def add_incremental_arguments(parser):
+    parser.add_argument('--incremental', action='store_true',
+                        help='only redraw the cells that changed since the previous frame')
+    parser.add_argument('--delta-threshold', type=NON_NEGATIVE_INT, default=0,
+                        help='with --incremental, ignore cells whose samples moved by at most this much')
+
+
+def add_metrics_arguments(parser):
+    parser.add_argument('--metrics', help='write per-stage timings to this file (.prom or .txt for Prometheus, '
+                                          'otherwise JSON)')
+    parser.add_argument('--metrics-interval', type=POSITIVE_FLOAT, default=5.0,
+                        help='seconds between rewrites of the --metrics file while running')
+
+
+def add_prefetch_argument(parser):
+    parser.add_argument('--prefetch', type=NON_NEGATIVE_INT, default=4,
+                        help='frames decoded ahead on a separate thread, 0 to decode between frames')
+
+
+def get_prefetch(args):
+    # a live camera would only queue up frames that are stale by the time they are shown
+    return 0 if args.input == 'webcam' else args.prefetch
+
+
+def add_cache_arguments(parser):
+    parser.add_argument('--cache', default=CACHE_DIR,
+                        help='folder of converted results reused for the same input and settings '
+                             '(ASCII_ART_CACHE by default)')
+    parser.add_argument('--cache-size', type=POSITIVE_INT, default=1024,
+                        help='MB the --cache folder may grow to before the least recently used results go')
+
+
+def add_budget_arguments(parser):
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--target-fps', type=POSITIVE_FLOAT,
+                       help='frames (or images) per second to convert, across all workers; inputs are divided by '
+                            'whole factors, cells included, until a frame fits')
+    group.add_argument('--frame-time', type=POSITIVE_FLOAT,
+                       help='milliseconds one worker may spend converting a frame')
+    parser.add_argument('--max-downscale', type=POSITIVE_INT, default=4,
+                        help='largest factor --target-fps or --frame-time divides the input size by')
+
+
+def get_frame_time(args):
+    if getattr(args, 'frame_time', None):
+        return args.frame_time / 1000
+    if getattr(args, 'target_fps', None):
+        return (getattr(args, 'segments', None) or args.workers) / args.target_fps
+    return None
+
+
+def get_settings(args):
+    # everything that changes the output of a conversion, and nothing else
+    settings = {'mode': args.mode, 'color': args.color, 'font_size': args.font_size, 'pixel_size': args.pixel_size,
+                'color_lvl': args.color_lvl, 'chars': args.chars, 'sampling': args.sampling, 'gamma': args.gamma}
+    # options that only change the speed (backend, workers, prefetch, metrics) are left out; the optional ones are
+    # only added when given, so results cached before they existed keep their keys
+    if getattr(args, 'incremental', False):
+        settings.update(incremental=True, delta_threshold=args.delta_threshold)
+    if get_frame_time(args):
+        settings.update(frame_time=get_frame_time(args), max_downscale=args.max_downscale)
+    return settings
+
+
+def create_converter(args, frame_size, downscale=1):
+    return ArtConverter(frame_size, mode=args.mode, color=args.color, font_size=args.font_size,
+                        pixel_size=args.pixel_size, color_lvl=args.color_lvl, chars=args.chars,
+                        is_incremental=getattr(args, 'incremental', False),
+                        delta_threshold=getattr(args, 'delta_threshold', 0),
+                        backend=args.backend, sampling=args.sampling, gamma=args.gamma, downscale=downscale)
+
+
+def create_controller(args):
+    frame_time = get_frame_time(args)
+    if frame_time is None:
+        return None
+    from .scaling import ResolutionController
+
+    # ascii cells are int(0.6 * font_size) pixels wide, and factors that would take them below 2 pixels would
+    # multiply the cells instead of keeping their number, so they are never tried
+    char_step = int(args.font_size * 0.6)
+    max_downscale = args.max_downscale
+    if args.mode == 'ascii':
+        max_downscale = min(max_downscale, max(int(char_step / 1.5), 1))
+
+    def create_scaled_converter(frame_size, downscale):
+        if downscale == 1:
+            return create_converter(args, frame_size)
+        # the cells shrink with the frame, so the smaller output keeps about as many of them; the font is the
+        # smallest one whose truncated step is the one wanted
+        step = max(round(char_step / downscale), 2)
+        sizes = {'font_size': -(-step * 5 // 3), 'pixel_size': max(round(args.pixel_size / downscale), 1)}
+        return create_converter(argparse.Namespace(**{**vars(args), **sizes}), frame_size, downscale)
+
+    return ResolutionController(create_scaled_converter, frame_time, max_downscale)
+
+
+def create_profiler(args):
+    if not args.metrics:
+        return None
+    from .metrics import Profiler
+
+    return Profiler(path=args.metrics, dump_interval=args.metrics_interval)
+
+
+def convert(args):
+    cache = open_cache(args.cache, args.cache_size * 2 ** 20) if args.input != 'webcam' else None
+    key = None
+    if cache is not None:
+        settings = {**get_settings(args), 'encoder': args.encoder, 'preset': args.preset, 'crf': args.crf,
+                    'audio': not args.no_audio}
+        if args.segments:
+            # every part is encoded on its own and starts with a keyframe
+            settings['segments'] = args.segments
+        key = cache.get_key(get_file_hash(args.input), settings)
+        if cache.get(key, args.output):
+            print(f'{args.output} copied from the cache')
+            return
+
+    source = open_source(args.input)
+    controller = create_controller(args)
+    if controller is None:
+        converter = create_converter(args, source.frame_size)
+    else:
+        converter = controller.calibrate(source.frame_size)
+        width, height = source.frame_size
+        print(f'{width}x{height} scaled to {converter.screen_width}x{converter.screen_height} '
+              f'to convert a frame in {1000 * controller.target_time:.1f} ms')
+    start_time = time.perf_counter()
+    if args.segments:
+        from .segments import convert_segmented
+
+        try:
+            frame_count = convert_segmented(converter, source, args.output, args.segments, args.encoder,
+                                            args.preset, args.crf, not args.no_audio, args.ffmpeg, cache, key)
+        finally:
+            source.release()
+    else:
+        sink = open_sink(args.output, source, args.encoder, args.preset, args.crf, not args.no_audio, args.ffmpeg,
+                         converter.screen_size)
+        profiler = create_profiler(args)
+        try:
+            frame_count = convert_video(converter, source, sink, args.workers, profiler, get_prefetch(args))
+        finally:
+            sink.release()
+            source.release()
+            if profiler is not None:
+                profiler.dump()
+    elapsed_time = time.perf_counter() - start_time
+    print(f'{frame_count} frames in {elapsed_time:.2f} s ({frame_count / elapsed_time:.1f} fps)')
+    if cache is not None:
+        cache.put(key, args.output)
+
+
+def view(args):
+    from .viewer import Viewer
+
+    source = open_source(args.input)
+    if not args.live:
+        converter = create_converter(args, source.frame_size)
+        Viewer(source, converter, args.save, args.record, args.sound, create_profiler(args), get_prefetch(args)).run()
+        return
+
+    from .live import CellSizeController
+    from .sources import LatestFrameSource
+
+    def create_sized_converter(size):
+        size_name = 'font_size' if args.mode == 'ascii' else 'pixel_size'
+        return create_converter(argparse.Namespace(**{**vars(args), size_name: size}), source.frame_size)
+
+    size = args.font_size if args.mode == 'ascii' else args.pixel_size
+    controller = CellSizeController(create_sized_converter, size, 1 / args.target_fps, args.max_size)
+    source = LatestFrameSource(source)
+    try:
+        Viewer(source, controller.converter, args.save, args.record, args.sound, create_profiler(args),
+               controller=controller).run()
+    finally:
+        source.release()
+
+
+def tile(args):
+    from .tiles import convert_tiled
+
+    start_time = time.perf_counter()
+    strip_count = convert_tiled(args.input, args.output, lambda frame_size: create_converter(args, frame_size),
+                                args.memory * 2 ** 20, args.workers, args.strip_rows)
+    print(f'{strip_count} strips in {time.perf_counter() - start_time:.2f} s')
+
+
+def batch(args):
+    from .batch import convert_batch
+
+    def print_failure(entry):
+        if entry['status'] == 'failed':
+            print(f"failed: {entry['input']}: {entry['error']}")
+
+    controller = create_controller(args)
+    if controller is not None:
+        # a 1080p frame gives the first estimate, and every image converted refines it
+        controller.calibrate((1920, 1080))
+    manifest = convert_batch(args.input, args.output, lambda frame_size: create_converter(args, frame_size),
+                             get_settings(args), args.workers, args.skip, args.extension, args.manifest,
+                             print_failure, open_cache(args.cache, args.cache_size * 2 ** 20), controller)
+    images_per_second = manifest['converted'] / manifest['seconds'] if manifest['seconds'] else 0
+    print(f"{manifest['converted']} converted, {manifest['cached']} from the cache, {manifest['skipped']} skipped, "
+          f"{manifest['failed']} failed "
+          f"in {manifest['seconds']:.2f} s ({images_per_second:.1f} images/s)")
+    if manifest['failed']:
+        raise SystemExit(1)
+
+
+def text(args):
+    from .text import TextConverter, TextSink
+
+    source = open_source(args.input)
+    columns = args.columns
+    if columns is None and args.output in (None, '-') and sys.stdout.isatty():
+        columns = shutil.get_terminal_size().columns
+    converter = TextConverter(source.frame_size, color=args.color, font_size=args.font_size,
+                              color_lvl=args.color_lvl, chars=args.chars, text_format=args.format, columns=columns,
+                              sampling=args.sampling, gamma=args.gamma)
+    sink = TextSink(args.output, fps=source.fps if args.realtime else None)
+    try:
+        convert_video(converter, source, sink, prefetch=get_prefetch(args))
+    finally:
+        sink.release()
+        source.release()
+
+
+def benchmark(args):
+    from .benchmark import compare_results, load_report, run_benchmarks, run_import_benchmarks, save_report
+
+    def print_result(result):
+        size = result.get('font_size') or result.get('pixel_size')
+        stages = ' '.join(f"{stage} {timing['mean_ms']:.1f}" for stage, timing in result['stages'].items())
+        print(f"{result['resolution']} {result['input']} {result['mode']} {result['color']} {result['backend']} "
+              f"{result.get('sampling', 'point')} size={size} lvl={result['color_lvl']}: {result['fps']:.1f} fps "
+              f"({stages} ms)")
+
+    def print_import(result):
+        print(f"import {result['import']}: {result['median_ms']:.1f} ms "
+              f"(loads {' '.join(result['heavy_modules']) or 'no heavy modules'})")
+
+    if args.imports:
+        report = run_import_benchmarks(repeat=args.frames, progress=print_import)
+    else:
+        report = run_benchmarks(args.resolutions, args.inputs, args.modes, args.colors, args.font_sizes,
+                                args.pixel_sizes, args.color_lvls, args.frames, print_result, args.backends,
+                                args.samplings)
+    if args.output:
+        save_report(report, args.output)
+    if args.compare:
+        regressions = compare_results(load_report(args.compare), report, args.tolerance)
+        for regression in regressions:
+            print(f'regression: {regression}')
+        if regressions:
+            raise SystemExit(1)
+
+
+def warmup(args):
+    start_time = time.perf_counter()
+    from .kernels import warm_up
+
+    warm_up()
+    print(f'numba kernels compiled and cached in {time.perf_counter() - start_time:.2f} s')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='ascii-art',
+                                     description='Convert videos and images to ASCII and pixel art.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert_parser = subparsers.add_parser('convert', help='convert a file as fast as possible, without a window')
+    convert_parser.add_argument('input', help="image or video file, or 'webcam'")
+    convert_parser.add_argument('output', help='image or video file to write')
+    add_converter_arguments(convert_parser)
+    add_incremental_arguments(convert_parser)
+    add_metrics_arguments(convert_parser)
+    convert_parser.add_argument('--workers', type=POSITIVE_INT, default=1, help='worker processes converting frames')
+    convert_parser.add_argument('--encoder', choices=ENCODERS, default='opencv',
+                                help='ffmpeg pipes frames to x264 and copies the audio track of the input')
+    convert_parser.add_argument('--preset', default='veryfast', help='x264 preset (--encoder ffmpeg)')
+    convert_parser.add_argument('--crf', type=CRF, default=23, help='x264 quality, lower is better (--encoder ffmpeg)')
+    convert_parser.add_argument('--no-audio', action='store_true', help='leave the audio track out (--encoder ffmpeg)')
+    convert_parser.add_argument('--ffmpeg', default='ffmpeg', help='ffmpeg executable (--encoder ffmpeg)')
+    convert_parser.add_argument('--segments', type=POSITIVE_INT,
+                                help='split a video into this many parts at keyframes and convert each in its own '
+                                     'process, with its own decoder and encoder (needs ffmpeg)')
+    add_prefetch_argument(convert_parser)
+    add_budget_arguments(convert_parser)
+    add_cache_arguments(convert_parser)
+    convert_parser.set_defaults(func=convert)
+
+    view_parser = subparsers.add_parser('view', help='show the conversion in a window (S saves, R records)')
+    view_parser.add_argument('input', help="image or video file, or 'webcam'")
+    add_converter_arguments(view_parser)
+    add_incremental_arguments(view_parser)
+    add_metrics_arguments(view_parser)
+    view_parser.add_argument('--save', default='art.jpg', help='where S saves the current frame')
+    view_parser.add_argument('--record', help='where R records the converted video')
+    view_parser.add_argument('--sound', action='store_true', help='play the audio track of the input')
+    add_prefetch_argument(view_parser)
+    view_parser.add_argument('--live', action='store_true',
+                             help='always show the newest camera frame, dropping the ones that could not keep up, and '
+                                  'grow the cells while a frame takes longer than --target-fps allows')
+    view_parser.add_argument('--target-fps', type=POSITIVE_FLOAT, default=30, help='frame rate --live holds')
+    view_parser.add_argument('--max-size', type=POSITIVE_INT,
+                             help='largest font or pixel size --live grows to, 4 times the given size by default')
+    view_parser.set_defaults(func=view)
+
+    tile_parser = subparsers.add_parser('tile', help='convert a very large image strip by strip in bounded memory')
+    tile_parser.add_argument('input', help='image file; .npy, binary .ppm and uncompressed .bmp are memory-mapped')
+    tile_parser.add_argument('output', help='.png, .ppm or .npy file, written strip by strip')
+    add_converter_arguments(tile_parser)
+    tile_parser.add_argument('--workers', type=POSITIVE_INT, default=1, help='worker processes converting strips')
+    tile_parser.add_argument('--memory', type=POSITIVE_INT, default=256, help='memory budget for the strips in MB')
+    tile_parser.add_argument('--strip-rows', type=POSITIVE_INT, help='rows of cells per strip instead of the budget')
+    tile_parser.set_defaults(func=tile)
+
+    batch_parser = subparsers.add_parser('batch', help='convert every image in a folder or glob with a process pool')
+    batch_parser.add_argument('input', help="folder, searched recursively, or glob pattern such as 'photos/**/*.jpg'")
+    batch_parser.add_argument('output', help='folder to write the images to, mirroring the input folders')
+    add_converter_arguments(batch_parser)
+    batch_parser.add_argument('--workers', type=POSITIVE_INT, default=os.cpu_count() or 1,
+                              help='worker processes converting images, one per core by default')
+    batch_parser.add_argument('--skip', choices=SKIP_MODES, default='mtime',
+                              help='leave outputs newer than their input, or made from an input with the same '
+                                   'content, as they are')
+    batch_parser.add_argument('--extension', help='write the images in this format, such as png, instead of the '
+                                                  'format of each input')
+    batch_parser.add_argument('--manifest', help=f'JSON summary of the batch, {MANIFEST_NAME} in the output folder '
+                                                 f'by default')
+    add_budget_arguments(batch_parser)
+    add_cache_arguments(batch_parser)
+    batch_parser.set_defaults(func=batch)
+
+    text_parser = subparsers.add_parser('text', help='write the characters as text, coloured with ANSI escapes')
+    text_parser.add_argument('input', help="image or video file, or 'webcam'")
+    text_parser.add_argument('output', nargs='?', help='text file to write, standard output by default')
+    text_parser.add_argument('--color', choices=COLORS, default='rgb')
+    text_parser.add_argument('--format', choices=TEXT_FORMATS, default='truecolor',
+                             help='plain text, or 256-colour or 24-bit ANSI colours')
+    text_parser.add_argument('--font-size', type=FONT_SIZE, default=12,
+                             help='one character per 0.6 * font size pixels, as in ascii mode')
+    text_parser.add_argument('--columns', type=POSITIVE_INT, help='characters per line, the terminal width by default')
+    text_parser.add_argument('--color-lvl', type=COLOR_LVL, default=8)
+    text_parser.add_argument('--chars', help='characters from darkest to brightest')
+    text_parser.add_argument('--gamma', type=POSITIVE_FLOAT, default=1.0,
+                             help='curve applied to brightness before picking characters, below 1 uses denser ones')
+    text_parser.add_argument('--sampling', choices=SAMPLINGS, default='point',
+                             help='area averages every pixel of a cell instead of taking its top left one')
+    text_parser.add_argument('--realtime', action='store_true', help='write frames at the frame rate of the input')
+    add_prefetch_argument(text_parser)
+    text_parser.set_defaults(func=text)
+
+    benchmark_parser = subparsers.add_parser('benchmark', help='time every mode on generated frames')
+    benchmark_parser.add_argument('--resolutions', nargs='+', choices=RESOLUTIONS, default=list(RESOLUTIONS))
+    benchmark_parser.add_argument('--inputs', nargs='+', choices=INPUTS, default=list(INPUTS))
+    benchmark_parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    benchmark_parser.add_argument('--colors', nargs='+', choices=COLORS, default=list(COLORS))
+    benchmark_parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=['numpy'])
+    benchmark_parser.add_argument('--samplings', nargs='+', choices=SAMPLINGS, default=['point'])
+    benchmark_parser.add_argument('--font-sizes', nargs='+', type=FONT_SIZE, default=list(FONT_SIZES))
+    benchmark_parser.add_argument('--pixel-sizes', nargs='+', type=POSITIVE_INT, default=list(PIXEL_SIZES))
+    benchmark_parser.add_argument('--color-lvls', nargs='+', type=COLOR_LVL, default=list(COLOR_LVLS))
+    benchmark_parser.add_argument('--frames', type=POSITIVE_INT, default=10,
+                                  help='frames timed per case, or fresh interpreters per import with --imports')
+    benchmark_parser.add_argument('--imports', action='store_true',
+                                  help='time importing the package instead of converting frames')
+    benchmark_parser.add_argument('--output', help='JSON file to write the results to')
+    benchmark_parser.add_argument('--compare', help='JSON results of an earlier run to check for regressions')
+    benchmark_parser.add_argument('--tolerance', type=NON_NEGATIVE_FLOAT, default=0.1,
+                                  help='relative fps drop reported as a regression')
+    benchmark_parser.set_defaults(func=benchmark)
+
+    warmup_parser = subparsers.add_parser('warmup', help='compile the numba kernels into their on-disk cache')
+    warmup_parser.set_defaults(func=warmup)
+
+    args = parser.parse_args(argv)
+    if getattr(args, 'segments', None) and (args.input == 'webcam' or is_image_path(args.input)):
+        parser.error('--segments splits video files')
+    if getattr(args, 'segments', None) and (args.workers > 1 or args.metrics):
+        parser.error('--segments already converts in one process per segment, without --workers or --metrics')
+    if getattr(args, 'chars', None) and len(args.chars) == 1 and getattr(args, 'mode', 'ascii') == 'ascii' and \
+            args.func != text:
+        parser.error('--chars needs at least two characters in ascii mode, the first one stands for black and is '
+                     'never drawn')
+    if getattr(args, 'live', False) and args.incremental:
+        parser.error('--live switches between cell sizes and cannot be --incremental')
+    if getattr(args, 'max_size', None) and \
+            args.max_size < (args.font_size if args.mode == 'ascii' else args.pixel_size):
+        parser.error('--max-size must be at least the font or pixel size --live starts from')
+    if getattr(args, 'incremental', False) and getattr(args, 'workers', 1) > 1:
+        parser.error('--incremental redraws on top of the previous frame and cannot be split across --workers')
+    if getattr(args, 'incremental', False) and getattr(args, 'backend', 'numpy') == 'numba':
+        parser.error('--incremental is only supported by the numpy backend')
+    args.func(args)
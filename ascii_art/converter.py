@@ -0,0 +1,125 @@
+import numpy as np
+import time
+import cv2
+
+from .quantizer import ColorQuantizer
+from .renderers import AsciiRenderer, PixelRenderer
+from .sampler import CellSampler
+
+
+GRAY_CHARS = ' .",:;!~+-xmo*#W&8@'
+COLOR_CHARS = ' ixzao*#MW&8%B@$'
+MODES = ('ascii', 'pixel')
+COLORS = ('gray', 'rgb')
+BACKENDS = ('numpy', 'numba')
+
+
+class DeltaTracker:
+
+    def __init__(self, threshold=0):
+        self.threshold = threshold
+        self.keys = self.samples = None
+
+    def update(self, keys, samples):
+        # starts from all-zero keys, which is what a black frame shows
+        if self.keys is None:
+            self.keys = np.zeros_like(keys)
+            self.samples = np.zeros(samples.shape, dtype=np.int16)
+        changed = (keys != self.keys).any(axis=2)
+        if self.threshold:
+            samples = samples.astype(np.int16)
+            changed &= (np.abs(samples - self.samples) > self.threshold).any(axis=2)
+        self.keys[changed] = keys[changed]
+        self.samples[changed] = samples[changed]
+        return changed, self.keys
+
+
+class ArtConverter:
+
+    def __init__(self, frame_size, mode='ascii', color='rgb', font_size=12, pixel_size=7, color_lvl=8,
+                 chars=None, is_incremental=False, delta_threshold=0, backend='numpy', sampling='point',
+                 gamma=1.0, downscale=1):
+        if mode not in MODES:
+            raise ValueError(f'mode must be one of {MODES}, not {mode!r}')
+        if color not in COLORS:
+            raise ValueError(f'color must be one of {COLORS}, not {color!r}')
+        if backend not in BACKENDS:
+            raise ValueError(f'backend must be one of {BACKENDS}, not {backend!r}')
+        if mode == 'ascii' and chars is not None and len(chars) == 1:
+            raise ValueError('ascii mode needs at least two chars, the first one stands for black and is never drawn')
+        if backend == 'numba' and is_incremental:
+            raise ValueError('the numba backend always renders whole frames and cannot be incremental')
+        # frames of frame_size are divided by a whole downscale factor before their cells are sampled, which
+        # INTER_AREA does in one fast pass; the few pixels past the last whole multiple are dropped
+        self.input_size = tuple(frame_size)
+        self.downscale = downscale
+        frame_size = frame_size[0] // downscale, frame_size[1] // downscale
+        self.screen_size = self.screen_width, self.screen_height = frame_size
+        self.mode = mode
+        self.is_color = color == 'rgb'
+        self.quantizer = ColorQuantizer(color_lvl) if self.is_color else None
+        if mode == 'ascii':
+            chars = chars or (COLOR_CHARS if self.is_color else GRAY_CHARS)
+            self.renderer = AsciiRenderer(frame_size, font_size, chars, self.is_color, gamma)
+            self.sampler = CellSampler(self.renderer.char_step, sampling=sampling)
+        else:
+            self.renderer = PixelRenderer(frame_size, pixel_size)
+            self.sampler = CellSampler(pixel_size, sampling=sampling)
+        self.delta = DeltaTracker(delta_threshold) if is_incremental else None
+        self.kernels = None
+        if backend == 'numba':
+            from .kernels import KernelBackend
+            self.kernels = KernelBackend(self)
+
+    def convert_frame(self, cv2_image, output=None, profiler=None):
+        if profiler is None:
+            return self.render_cells(self.get_cells(cv2_image), output)
+        start_time = time.perf_counter()
+        cells = self.get_cells(cv2_image)
+        start_time = profiler.record('convert', start_time)
+        frame = self.render_cells(cells, output)
+        profiler.record('render', start_time)
+        return frame
+
+    def get_cells(self, cv2_image):
+        if self.downscale > 1:
+            cv2_image = cv2_image[:self.screen_height * self.downscale, :self.screen_width * self.downscale]
+            cv2_image = cv2.resize(cv2_image, self.screen_size, interpolation=cv2.INTER_AREA)
+        if self.kernels is not None:
+            return self.kernels.get_cells(cv2_image)
+        # one contiguous copy of the sampled cells feeds both the gray conversion and the colour table lookups
+        cells = np.ascontiguousarray(self.sampler.sample(cv2_image))
+        gray_cells = None
+        if self.mode == 'ascii' or not self.is_color:
+            gray_cells = cv2.cvtColor(cells, cv2.COLOR_BGR2GRAY)
+        colors = self.quantizer.quantize(cells) if self.is_color else None
+        return cells, gray_cells, colors
+
+    def render_cells(self, sampled_cells, output=None):
+        if self.kernels is not None:
+            return self.kernels.render_cells(sampled_cells, output)
+        cells, gray_cells, colors = sampled_cells
+        if self.mode == 'ascii':
+            char_indices = self.renderer.get_char_indices(gray_cells)
+            if self.delta is None:
+                return self.renderer.render(char_indices, colors, output)
+            keys = np.dstack((char_indices, colors)) if self.is_color else char_indices[:, :, None]
+            changed, keys = self.delta.update(keys, self.get_samples(cells, gray_cells))
+            colors = keys[:, :, 1:] if self.is_color else None
+            return self.renderer.render_changed(keys[:, :, 0], colors, changed, output)
+
+        colors = colors if self.is_color else gray_cells
+        if self.delta is None:
+            return self.renderer.render(colors, output)
+        keys = colors.reshape(*colors.shape[:2], -1)
+        changed, keys = self.delta.update(keys, self.get_samples(cells, gray_cells))
+        return self.renderer.render_changed(keys, changed, output)
+
+    def get_samples(self, cells, gray_cells):
+        samples = [] if gray_cells is None else [gray_cells]
+        if self.is_color:
+            samples.append(cells)
+        return np.dstack(samples)
+
+    def create_frame(self):
+        return np.zeros((self.screen_height, self.screen_width, 3), dtype=np.uint8)
@@ -0,0 +1,21 @@
+import contextlib
+import os
+
+
+@contextlib.contextmanager
+def open_temp_path(path, keep_extension=False):
+    # the block writes to a temporary name next to path, renamed over it once the block succeeds, so that readers
+    # and interrupted runs only ever see the old file or the whole new one; writers that pick the format from the
+    # extension, such as cv2.imwrite, need keep_extension
+    if keep_extension:
+        name, extension = os.path.splitext(path)
+        temp_path = f'{name}.{os.getpid()}.tmp{extension}'
+    else:
+        temp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        yield temp_path
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, path)
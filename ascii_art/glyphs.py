@@ -0,0 +1,55 @@
+import numpy as np
+import functools
+import os
+
+from .files import open_temp_path
+
+
+FONT_NAME = 'Сourier'
+# set to a directory to keep rasterized glyphs between runs
+GLYPH_CACHE_DIR = os.environ.get('ASCII_ART_GLYPH_CACHE')
+
+
+def rasterize_glyphs(chars, font_size):
+    import pygame as pg
+
+    pg.font.init()
+    font = pg.font.SysFont(FONT_NAME, font_size, bold=True)
+    glyphs = []
+    for char in chars:
+        rendered_char = font.render(char, False, 'white')
+        glyph_surface = pg.Surface(rendered_char.get_size())
+        glyph_surface.blit(rendered_char, (0, 0))
+        glyphs.append(pg.surfarray.array3d(glyph_surface)[:, :, 0].T > 0)
+    height = max(glyph.shape[0] for glyph in glyphs)
+    width = max(glyph.shape[1] for glyph in glyphs)
+    atlas = np.zeros((len(glyphs), height, width), dtype=bool)
+    for char_index, glyph in enumerate(glyphs):
+        atlas[char_index, :glyph.shape[0], :glyph.shape[1]] = glyph
+    return atlas
+
+
+def get_cache_path(cache_dir, chars, font_size):
+    # pygame is deliberately left out of the key, a hit must not import it; clear the directory after upgrading
+    import hashlib
+
+    key = f'{FONT_NAME}|{font_size}|{chars}'.encode()
+    return os.path.join(cache_dir, f'glyphs-{hashlib.sha1(key).hexdigest()[:16]}.npy')
+
+
+@functools.lru_cache(maxsize=32)
+def load_glyph_atlas(chars, font_size, cache_dir=GLYPH_CACHE_DIR):
+    if cache_dir is None:
+        atlas = rasterize_glyphs(chars, font_size)
+    else:
+        cache_path = get_cache_path(cache_dir, chars, font_size)
+        try:
+            atlas = np.load(cache_path)
+        except (OSError, ValueError):
+            atlas = rasterize_glyphs(chars, font_size)
+            os.makedirs(cache_dir, exist_ok=True)
+            with open_temp_path(cache_path) as temp_path, open(temp_path, 'wb') as file:
+                np.save(file, atlas)
+    # the same atlas is handed to every renderer with these settings
+    atlas.setflags(write=False)
+    return atlas
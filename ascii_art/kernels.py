@@ -0,0 +1,119 @@
+from numba import config, njit, prange
+import numpy as np
+import functools
+import cv2
+import os
+
+
+# frames and strips are converted in forked workers, and of numba's threading layers only workqueue survives
+# a fork (TBB hangs the parent at exit, GNU OpenMP aborts the child); NUMBA_THREADING_LAYER still wins if set
+if 'NUMBA_THREADING_LAYER' not in os.environ:
+    config.THREADING_LAYER = 'workqueue'
+
+
+# explicit signatures compile every kernel eagerly at import, or load it from numba's on-disk cache, so no
+# frame pays for compilation; outputs may be any (H, W, 3) view, the buffers owned here are contiguous
+CELLS = 'uint8[:, :, ::1]'
+GRAY_CELLS = 'uint8[:, ::1]'
+OUTPUTS = ('uint8[:, :, ::1]', 'uint8[:, :, :]')
+
+
+@njit([f'void({GRAY_CELLS}, uint8[::1], {CELLS}, boolean, boolean[:, :, ::1], int64, {output})'
+       for output in OUTPUTS], cache=True, parallel=True)
+def render_ascii(gray_cells, char_lut, colors, is_color, glyphs, char_step, output):
+    # glyphs overlap the next cells, so each column of cells is painted by its own thread: it draws every
+    # glyph reaching into the column, clipped to it, column by column and top to bottom like the old blits
+    height, width = output.shape[:2]
+    cells_y, cells_x = gray_cells.shape
+    glyph_height, glyph_width = glyphs.shape[1:]
+    reach_x = (glyph_width - 1) // char_step
+    for column in prange(cells_x):
+        left, right = column * char_step, min((column + 1) * char_step, width)
+        output[:, left:right] = 0
+        for cell_x in range(max(0, column - reach_x), column + 1):
+            x = cell_x * char_step
+            first_x, last_x = max(left - x, 0), min(right - x, glyph_width)
+            for cell_y in range(cells_y):
+                char_index = char_lut[gray_cells[cell_y, cell_x]]
+                if char_index == 0:
+                    continue
+                if is_color:
+                    blue, green, red = colors[cell_y, cell_x]
+                else:
+                    blue = green = red = 255
+                y = cell_y * char_step
+                for glyph_y in range(min(glyph_height, height - y)):
+                    for glyph_x in range(first_x, last_x):
+                        if glyphs[char_index, glyph_y, glyph_x]:
+                            output[y + glyph_y, x + glyph_x, 0] = blue
+                            output[y + glyph_y, x + glyph_x, 1] = green
+                            output[y + glyph_y, x + glyph_x, 2] = red
+
+
+@njit([f'void({GRAY_CELLS}, {CELLS}, boolean, int64, {output})' for output in OUTPUTS], cache=True, parallel=True)
+def render_pixels(gray_cells, colors, is_color, pixel_size, output):
+    # the first row of every block row is filled cell by cell, the rest of the block row copies it
+    height, width = output.shape[:2]
+    for cell_y in prange(-(-height // pixel_size)):
+        y = cell_y * pixel_size
+        for x in range(width):
+            cell_x = x // pixel_size
+            for channel in range(3):
+                if is_color:
+                    output[y, x, channel] = colors[cell_y, cell_x, channel]
+                else:
+                    output[y, x, channel] = gray_cells[cell_y, cell_x]
+        for block_y in range(y + 1, min(y + pixel_size, height)):
+            for x in range(width):
+                for channel in range(3):
+                    output[block_y, x, channel] = output[y, x, channel]
+
+
+@functools.lru_cache(maxsize=None)
+def warm_up():
+    # one call per signature on a single cell starts numba's thread pool before the first real frame
+    cells, gray_cells = np.zeros((1, 1, 3), dtype=np.uint8), np.zeros((1, 1), dtype=np.uint8)
+    glyphs = np.zeros((1, 1, 1), dtype=bool)
+    for output in (np.zeros((1, 1, 3), dtype=np.uint8), np.zeros((1, 2, 3), dtype=np.uint8)[:, ::2]):
+        render_ascii(gray_cells, np.zeros(256, dtype=np.uint8), cells, True, glyphs, 1, output)
+        render_pixels(gray_cells, cells, True, 1, output)
+
+
+class KernelBackend:
+
+    def __init__(self, converter):
+        # the sampled cells, their gray values and colours live in buffers reused for every frame
+        self.converter = converter
+        renderer = converter.renderer
+        step = converter.sampler.step
+        cells_x, cells_y = converter.sampler.get_grid_size(converter.screen_size)
+        self.cells = np.zeros((cells_y, cells_x, 3), dtype=np.uint8)
+        self.gray_cells = np.zeros((cells_y, cells_x), dtype=np.uint8)
+        self.colors = np.zeros((cells_y, cells_x, 3) if converter.is_color else (0, 0, 3), dtype=np.uint8)
+        if converter.mode == 'ascii':
+            # the character table never points past the last glyph, so the kernel needs no bounds checks
+            self.glyphs, self.char_lut = renderer.glyphs, renderer.char_lut
+        self.step = step
+        self.frame = None
+        warm_up()
+
+    def get_cells(self, cv2_image):
+        self.converter.sampler.sample(cv2_image, self.cells)
+        if self.converter.mode == 'ascii' or not self.converter.is_color:
+            cv2.cvtColor(self.cells, cv2.COLOR_BGR2GRAY, dst=self.gray_cells)
+        if self.converter.is_color:
+            self.converter.quantizer.quantize(self.cells, self.colors)
+        return self.cells, self.gray_cells, self.colors
+
+    def render_cells(self, sampled_cells, output=None):
+        if output is None:
+            if self.frame is None:
+                self.frame = self.converter.create_frame()
+            output = self.frame
+        _, gray_cells, colors = sampled_cells
+        if self.converter.mode == 'ascii':
+            render_ascii(gray_cells, self.char_lut, colors, self.converter.is_color, self.glyphs, self.step,
+                         output)
+        else:
+            render_pixels(gray_cells, colors, self.converter.is_color, self.step, output)
+        return output
@@ -0,0 +1,57 @@
+class CellSizeController:
+
+    def __init__(self, create_converter, size, target_time, max_size=None, cooldown=15, smoothing=0.2):
+        # size is font_size in ascii mode and pixel_size in pixel mode; it never drops below the one asked for
+        self.create_converter = create_converter
+        self.min_size = self.size = size
+        self.max_size = max_size or 4 * size
+        self.target_time = target_time
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+        self.converters = {}
+        self.converter = self.get_converter(size)
+        self.frame_time = None
+        self.frames_since_change = 0
+        # when each size last ran over the target, so that it is not tried again straight away
+        self.slow_frames = {}
+        self.frame_index = 0
+        # the frame time before the last growth; growing further is pointless when that growth bought nothing
+        self.time_before_growth = None
+
+    def get_converter(self, size):
+        converter = self.converters.get(size)
+        if converter is None:
+            converter = self.converters[size] = self.create_converter(size)
+        return converter
+
+    def update(self, seconds):
+        # a moving average of the work per frame decides: larger cells while it runs over the target, smaller
+        # ones again once it leaves room to spare; after a change the average gets cooldown frames to settle
+        if self.frame_time is None:
+            self.frame_time = seconds
+        else:
+            self.frame_time += self.smoothing * (seconds - self.frame_time)
+        self.frames_since_change += 1
+        self.frame_index += 1
+        if self.frames_since_change < self.cooldown:
+            return self.converter
+
+        size = self.size
+        if self.frame_time > self.target_time:
+            self.slow_frames[size] = self.frame_index
+            # decoding and displaying cost the same at every cell size, larger cells cannot make up for those
+            if self.time_before_growth is None or self.frame_time < 0.9 * self.time_before_growth:
+                size = min(max(size + 1, round(size * 1.25)), self.max_size)
+                self.time_before_growth = self.frame_time
+        elif self.frame_time < 0.6 * self.target_time:
+            smaller_size = max(min(size - 1, round(size / 1.25)), self.min_size)
+            # a size that was too slow gets another chance only after ten cooldowns, or the two would alternate
+            if self.frame_index - self.slow_frames.get(smaller_size, -10 * self.cooldown) >= 10 * self.cooldown:
+                size = smaller_size
+                self.time_before_growth = None
+        if size != self.size:
+            self.size = size
+            self.converter = self.get_converter(size)
+            self.frame_time = None
+            self.frames_since_change = 0
+        return self.converter
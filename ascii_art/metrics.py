@@ -0,0 +1,114 @@
+import numpy as np
+import json
+import time
+
+from .files import open_temp_path
+
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class RollingHistogram:
+
+    def __init__(self, window=1024):
+        # percentiles cover the last window samples, count and total cover the whole run
+        self.samples = np.zeros(window)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value):
+        self.samples[self.count % len(self.samples)] = value
+        self.count += 1
+        self.total += value
+
+    def get_quantiles(self, quantiles=QUANTILES):
+        samples = self.samples[:min(self.count, len(self.samples))]
+        if not len(samples):
+            return [0.0] * len(quantiles)
+        return np.quantile(samples, quantiles).tolist()
+
+
+class FrameTimings:
+
+    # stands in for the profiler inside a worker process and collects the stages of a single frame
+    def __init__(self):
+        self.timings = {}
+
+    def record(self, stage, start_time):
+        now = time.perf_counter()
+        self.timings[stage] = now - start_time
+        return now
+
+
+class Profiler:
+
+    def __init__(self, window=1024, path=None, dump_interval=None):
+        self.window = window
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.frame_count = 0
+        self.path = path
+        self.dump_interval = dump_interval
+        self.last_dump = time.perf_counter()
+
+    def add(self, stage, seconds):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = RollingHistogram(self.window)
+        histogram.add(seconds)
+
+    def record(self, stage, start_time):
+        now = time.perf_counter()
+        self.add(stage, now - start_time)
+        return now
+
+    def increment(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def end_frame(self):
+        self.frame_count += 1
+        if self.path and self.dump_interval is not None and \
+                time.perf_counter() - self.last_dump >= self.dump_interval:
+            self.dump()
+
+    def get_summary(self):
+        summary = {}
+        for stage, histogram in self.histograms.items():
+            p50, p95, p99 = histogram.get_quantiles()
+            summary[stage] = {'count': histogram.count, 'mean_ms': 1000 * histogram.total / histogram.count,
+                              'p50_ms': 1000 * p50, 'p95_ms': 1000 * p95, 'p99_ms': 1000 * p99}
+        return summary
+
+    def get_json(self):
+        return json.dumps({'frames': self.frame_count, 'stages': self.get_summary(), 'counters': self.counters,
+                           'gauges': self.gauges}, indent=2)
+
+    def get_prometheus(self):
+        lines = ['# HELP ascii_art_frames_total Frames converted.',
+                 '# TYPE ascii_art_frames_total counter',
+                 f'ascii_art_frames_total {self.frame_count}',
+                 '# HELP ascii_art_stage_seconds Time spent on one frame in each stage.',
+                 '# TYPE ascii_art_stage_seconds summary']
+        for stage, histogram in self.histograms.items():
+            for quantile, value in zip(QUANTILES, histogram.get_quantiles()):
+                lines.append(f'ascii_art_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {value:.6f}')
+            lines.append(f'ascii_art_stage_seconds_sum{{stage="{stage}"}} {histogram.total:.6f}')
+            lines.append(f'ascii_art_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        for name, value in self.counters.items():
+            lines += [f'# TYPE ascii_art_{name}_total counter', f'ascii_art_{name}_total {value}']
+        for name, value in self.gauges.items():
+            lines += [f'# TYPE ascii_art_{name} gauge', f'ascii_art_{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path=None):
+        # .prom and .txt files get the Prometheus text format, anything else JSON
+        path = path or self.path
+        text = self.get_prometheus() if path.endswith(('.prom', '.txt')) else self.get_json()
+        # written aside and renamed, so a scraper never reads a half-written file
+        with open_temp_path(path) as temp_path, open(temp_path, 'w') as file:
+            file.write(text)
+        self.last_dump = time.perf_counter()
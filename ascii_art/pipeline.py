@@ -0,0 +1,234 @@
+import numpy as np
+import threading
+import queue
+import time
+
+from .pool import limit_threads
+from .sources import PrefetchSource
+
+
+class FrameRing:
+
+    def __init__(self, slots, input_shape, output_shape):
+        from multiprocessing import shared_memory
+
+        self.slots = slots
+        input_size, output_size = int(np.prod(input_shape)), int(np.prod(output_shape))
+        self.memory = shared_memory.SharedMemory(create=True, size=slots * (input_size + output_size))
+        self.inputs = np.ndarray((slots, *input_shape), dtype=np.uint8, buffer=self.memory.buf)
+        self.outputs = np.ndarray((slots, *output_shape), dtype=np.uint8, buffer=self.memory.buf,
+                                  offset=slots * input_size)
+
+    def close(self):
+        del self.inputs, self.outputs
+        self.memory.close()
+        self.memory.unlink()
+
+
+def convert_frames(convert_frame, ring, task_queue, result_queue, is_profiled=False):
+    # the stage timings of each frame travel back with its result, to be added up by the encoder thread
+    from .metrics import FrameTimings
+
+    limit_threads()
+    for frame_index, slot in iter(task_queue.get, None):
+        timings = FrameTimings() if is_profiled else None
+        try:
+            if timings is None:
+                convert_frame(ring.inputs[slot], ring.outputs[slot])
+            else:
+                convert_frame(ring.inputs[slot], ring.outputs[slot], profiler=timings)
+            result_queue.put((frame_index, slot, None, timings and timings.timings))
+        except Exception as error:
+            result_queue.put((frame_index, slot, error, None))
+
+
+class FramePipeline:
+
+    def __init__(self, convert_frame, workers, input_shape, output_shape, ring_size=None, profiler=None,
+                 poll_interval=0.5):
+        # fork lets the workers inherit the converter and the ring mapping; only slot indices cross the queues
+        import multiprocessing as mp
+
+        self.context = mp.get_context('fork')
+        self.convert_frame = convert_frame
+        self.workers = workers
+        self.input_shape, self.output_shape = input_shape, output_shape
+        self.ring_size = ring_size or 4 * workers
+        self.profiler = profiler
+        self.poll_interval = poll_interval
+        self.error = None
+        self.is_stopped = False
+
+    def fail(self, error, free_slots):
+        # the first error is the one raised; the reader may be waiting for a slot, None wakes it up to stop
+        self.error = self.error or error
+        free_slots.put(None)
+
+    def encode_frames(self, ring, result_queue, free_slots, sink, workers):
+        pending = {}
+        next_index = 0
+        while True:
+            try:
+                result = result_queue.get(timeout=self.poll_interval)
+            except queue.Empty:
+                # a worker that died took its frames with it, they would never come back
+                exit_codes = [worker.exitcode for worker in workers if worker.exitcode]
+                if exit_codes and self.error is None:
+                    self.fail(RuntimeError(f'a frame worker exited with code {exit_codes[0]}'), free_slots)
+                if self.is_stopped:
+                    return
+                continue
+            if result is None:
+                return
+            frame_index, slot, error, timings = result
+            pending[frame_index] = slot, error, timings
+            while next_index in pending:
+                slot, error, timings = pending.pop(next_index)
+                if error is not None:
+                    self.fail(error, free_slots)
+                elif self.error is None:
+                    # after an error the remaining frames are only collected, so that their slots come back
+                    try:
+                        self.write_frame(ring.outputs[slot], timings, sink)
+                    except Exception as write_error:
+                        self.fail(write_error, free_slots)
+                free_slots.put(slot)
+                next_index += 1
+
+    def write_frame(self, frame, timings, sink):
+        if self.profiler is None:
+            sink.write(frame)
+            return
+        for stage, seconds in timings.items():
+            self.profiler.add(stage, seconds)
+        start_time = time.perf_counter()
+        sink.write(frame)
+        self.profiler.record('encode', start_time)
+        self.profiler.end_frame()
+
+    def read_frames(self, source, ring, task_queue, free_slots):
+        frame_count = 0
+        while True:
+            slot = free_slots.get()
+            if slot is None or self.error is not None:
+                return frame_count
+            frame_slot = ring.inputs[slot]
+            start_time = time.perf_counter()
+            cv2_image = source.read(frame_slot)
+            if cv2_image is None:
+                return frame_count
+            if self.profiler is not None:
+                self.profiler.record('decode', start_time)
+            if not np.may_share_memory(cv2_image, frame_slot):
+                frame_slot[:] = cv2_image
+            task_queue.put((frame_count, slot))
+            frame_count += 1
+
+    def run(self, source, sink):
+        ring = FrameRing(self.ring_size, self.input_shape, self.output_shape)
+        task_queue = self.context.Queue(self.ring_size)
+        result_queue = self.context.Queue(self.ring_size)
+        free_slots = queue.Queue()
+        for slot in range(self.ring_size):
+            free_slots.put(slot)
+
+        workers = [self.context.Process(target=convert_frames, daemon=True,
+                                        args=(self.convert_frame, ring, task_queue, result_queue,
+                                              self.profiler is not None))
+                   for _ in range(self.workers)]
+        encoder = threading.Thread(target=self.encode_frames, args=(ring, result_queue, free_slots, sink, workers))
+        is_finished = False
+        try:
+            for worker in workers:
+                worker.start()
+            encoder.start()
+            frame_count = self.read_frames(source, ring, task_queue, free_slots)
+            is_finished = self.error is None
+        finally:
+            # the workers and the encoder are stopped before the ring they use goes away, however the reader ended;
+            # after an error, workers still holding frames nobody will collect are terminated instead
+            if is_finished:
+                for _ in workers:
+                    task_queue.put(None)
+            for worker in workers:
+                if worker.pid is not None:
+                    if not is_finished:
+                        worker.terminate()
+                    worker.join()
+            if encoder.is_alive():
+                if is_finished:
+                    result_queue.put(None)
+                else:
+                    self.is_stopped = True
+                encoder.join()
+            ring.close()
+
+        if self.error is not None:
+            raise self.error
+        return frame_count
+
+
+def get_prepare(converter):
+    # sampling runs on the decoder thread too, unless the numba backend samples into buffers it reuses
+    return converter.get_cells if getattr(converter, 'kernels', None) is None else None
+
+
+def convert_prefetched(converter, source, sink, frame, profiler=None):
+    frame_count = 0
+    while True:
+        start_time = time.perf_counter()
+        cv2_image = source.read()
+        if cv2_image is None:
+            return frame_count
+        cells = source.prepared
+        if profiler is not None:
+            # decode and convert happened on the decoder thread, wait is how long this thread was held up by them
+            start_time = profiler.record('wait', start_time)
+            for stage, seconds in source.timings.items():
+                profiler.add(stage, seconds)
+        if cells is None:
+            cells = converter.get_cells(cv2_image)
+            if profiler is not None:
+                start_time = profiler.record('convert', start_time)
+        output = converter.render_cells(cells, frame)
+        if profiler is not None:
+            start_time = profiler.record('render', start_time)
+        sink.write(output)
+        if profiler is not None:
+            profiler.record('encode', start_time)
+            profiler.end_frame()
+        frame_count += 1
+
+
+def convert_video(converter, source, sink, workers=1, profiler=None, prefetch=0):
+    if workers > 1:
+        input_shape = converter.input_size[1], converter.input_size[0], 3
+        frame_shape = converter.screen_height, converter.screen_width, 3
+        pipeline = FramePipeline(converter.convert_frame, workers, input_shape, frame_shape, profiler=profiler)
+        return pipeline.run(source, sink)
+
+    frame = converter.create_frame()
+    if prefetch and not source.is_still:
+        source = PrefetchSource(source, prefetch, get_prepare(converter))
+        try:
+            return convert_prefetched(converter, source, sink, frame, profiler)
+        finally:
+            source.close()
+
+    cv2_image = None
+    frame_count = 0
+    while True:
+        start_time = time.perf_counter()
+        cv2_image = source.read(cv2_image)
+        if cv2_image is None:
+            return frame_count
+        if profiler is None:
+            sink.write(converter.convert_frame(cv2_image, frame))
+        else:
+            profiler.record('decode', start_time)
+            converter.convert_frame(cv2_image, frame, profiler)
+            start_time = time.perf_counter()
+            sink.write(frame)
+            profiler.record('encode', start_time)
+            profiler.end_frame()
+        frame_count += 1
@@ -0,0 +1,32 @@
+import sys
+import cv2
+
+
+shared = None
+
+
+def limit_threads():
+    # every process converts its own share, so OpenCV's and numba's thread pools would only compete with the
+    # other processes for the same cores
+    cv2.setNumThreads(1)
+    numba = sys.modules.get('numba')
+    if numba is not None:
+        numba.set_num_threads(1)
+
+
+def set_shared(shared_object):
+    global shared
+    shared = shared_object
+    limit_threads()
+
+
+def call_shared(method_name, *args):
+    return getattr(shared, method_name)(*args)
+
+
+def open_fork_pool(shared_object, processes):
+    # fork hands shared_object to every worker without pickling it, tasks only name one of its methods and pass
+    # their arguments: pool.apply_async(call_shared, ('convert_strip', index))
+    import multiprocessing as mp
+
+    return mp.get_context('fork').Pool(processes, initializer=set_shared, initargs=(shared_object,))
@@ -0,0 +1,33 @@
+import numpy as np
+import cv2
+
+
+def create_char_lut(char_count, gamma=1.0):
+    # gray values step through the characters every 255 // (char_count - 1) levels; a gamma other than 1 bends
+    # the gray values first, charsets too long for that many steps end on their last character, and a single
+    # character stands for every level
+    values = np.arange(256)
+    if gamma != 1:
+        values = np.rint(255 * (values / 255) ** gamma).astype(int)
+    step = max(255 // max(char_count - 1, 1), 1)
+    return np.minimum(values // step, char_count - 1).astype(np.uint8)
+
+
+class ColorQuantizer:
+
+    def __init__(self, color_lvl):
+        if not 2 <= color_lvl <= 256:
+            raise ValueError(f'color_lvl must be between 2 and 256, not {color_lvl!r}')
+        self.color_lvl = color_lvl
+        self.colors, self.color_step = self.create_palette()
+        # every channel value maps straight to its palette colour, one table lookup per channel; values past the
+        # last whole step stay on the brightest colour
+        self.lut = self.colors[np.minimum(np.arange(256) // self.color_step, color_lvl - 1)]
+
+    def create_palette(self):
+        # the palette is the same for every channel, so BGR and RGB samples quantize alike
+        colors, color_step = np.linspace(0, 255, num=self.color_lvl, dtype=int, retstep=True)
+        return colors.astype(np.uint8), int(color_step)
+
+    def quantize(self, samples, colors=None):
+        return cv2.LUT(samples, self.lut, dst=colors)
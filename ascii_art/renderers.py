@@ -0,0 +1,184 @@
+import numpy as np
+import cv2
+
+from .glyphs import load_glyph_atlas
+from .quantizer import create_char_lut
+
+
+BLACK = np.zeros((1, 3), dtype=np.uint8)
+
+
+class AsciiRenderer:
+
+    def __init__(self, frame_size, font_size, chars, is_color, gamma=1.0):
+        self.screen_size = self.screen_width, self.screen_height = frame_size
+        self.ASCII_chars = chars
+        self.char_lut = create_char_lut(len(chars), gamma)
+        self.is_color = is_color
+        self.font_size = font_size
+        self.char_step = int(font_size * 0.6)
+        self.glyphs = self.create_glyph_atlas()
+        self.glyph_blocks = self.create_glyph_blocks()
+        self.blocks_y, self.blocks_x = len(self.glyph_blocks), len(self.glyph_blocks[0])
+        self.cell_ids, self.padded_shape = self.create_cell_grid()
+        self.padded_frame = self.padded_tiles = None
+        # working arrays reused from frame to frame, made by the first render
+        self.buffers = None
+
+    def get_char_indices(self, gray_cells):
+        return cv2.LUT(gray_cells, self.char_lut)
+
+    def get_layers(self, char_indices):
+        # glyphs are taller and wider than char_step, so they overlap their neighbours; layers come
+        # in the x-major order the cells used to be blitted in, so the last cell painted still wins
+        step = self.char_step
+        cells_y, cells_x = char_indices.shape
+        char_ids, blocks, mask = self.buffers['char_ids'], self.buffers['blocks'], self.buffers['mask']
+        np.copyto(char_ids, char_indices)
+        for dx in reversed(range(self.blocks_x)):
+            for dy in reversed(range(self.blocks_y)):
+                np.take(self.glyph_blocks[dy][dx], char_ids, axis=0, out=blocks, mode='clip')
+                np.copyto(mask.reshape(cells_y, step, cells_x, step), blocks.transpose(0, 2, 1, 3))
+                region = slice(dy * step, (dy + cells_y) * step), slice(dx * step, (dx + cells_x) * step)
+                yield region, mask
+
+    def get_tile_layers(self, tile_ys, tile_xs, char_indices):
+        # cell ids count from 1 as in create_cell_grid; tiles off the grid get the id 0, whose char 0 has an empty glyph
+        cells_y, cells_x = char_indices.shape
+        chars = np.concatenate(([0], char_indices.ravel()))
+        for dx in reversed(range(self.blocks_x)):
+            for dy in reversed(range(self.blocks_y)):
+                cell_ys, cell_xs = tile_ys - dy, tile_xs - dx
+                is_cell = (cell_ys >= 0) & (cell_ys < cells_y) & (cell_xs >= 0) & (cell_xs < cells_x)
+                cell_ids = np.where(is_cell, cell_ys * cells_x + cell_xs + 1, 0)
+                yield cell_ids, self.glyph_blocks[dy][dx][chars[cell_ids]]
+
+    def render(self, char_indices, colors=None, output=None):
+        if output is None:
+            output = np.empty((self.screen_height, self.screen_width, 3), dtype=np.uint8)
+        if self.buffers is None:
+            self.buffers = self.create_buffers(char_indices.shape)
+        if colors is None:
+            # every glyph is white, so overlapping neighbours only need to be merged, not ordered
+            covered = self.buffers['covered']
+            covered.fill(False)
+            for region, mask in self.get_layers(char_indices):
+                covered[region] |= mask
+            covered = covered[:self.screen_height, :self.screen_width, None]
+            return np.multiply(covered, np.uint8(255), out=output, dtype=np.uint8)
+
+        owners, padded_colors = self.buffers['owners'], self.buffers['colors']
+        owners.fill(0)
+        for region, mask in self.get_layers(char_indices):
+            np.copyto(owners[region], self.cell_ids, where=mask)
+        # cell ids count from 1, so uncovered pixels keep the owner 0 of the black entry put first; the owners are
+        # already intp and in range, so take neither converts nor checks them
+        cell_colors = np.concatenate((BLACK, colors.reshape(-1, 3)))
+        np.take(cell_colors, owners, axis=0, out=padded_colors, mode='clip')
+        np.copyto(output, padded_colors[:self.screen_height, :self.screen_width])
+        return output
+
+    def render_changed(self, char_indices, colors, changed, output=None):
+        if self.padded_frame is None:
+            self.padded_frame, self.padded_tiles = self.create_frame_buffer()
+
+        # a changed cell repaints every char_step tile its glyph reaches, and each of those tiles
+        # is rebuilt from all the cells that overlap it, in the same order as render
+        step = self.char_step
+        cells_y, cells_x = changed.shape
+        dirty_tiles = np.zeros((cells_y + self.blocks_y - 1, cells_x + self.blocks_x - 1), dtype=bool)
+        for dy in range(self.blocks_y):
+            for dx in range(self.blocks_x):
+                dirty_tiles[dy:dy + cells_y, dx:dx + cells_x] |= changed
+        tile_ys, tile_xs = np.nonzero(dirty_tiles)
+
+        if colors is None:
+            covered = np.zeros((len(tile_ys), step, step), dtype=bool)
+            for _, mask in self.get_tile_layers(tile_ys, tile_xs, char_indices):
+                covered |= mask
+            self.padded_tiles[tile_ys, :, tile_xs] = covered[:, :, :, None].view(np.uint8) * np.uint8(255)
+        else:
+            owners = np.zeros((len(tile_ys), step, step), dtype=np.intp)
+            for cell_ids, mask in self.get_tile_layers(tile_ys, tile_xs, char_indices):
+                np.copyto(owners, cell_ids[:, None, None], where=mask)
+            cell_colors = np.concatenate((BLACK, colors.reshape(-1, 3)))
+            self.padded_tiles[tile_ys, :, tile_xs] = np.take(cell_colors, owners, axis=0, mode='clip')
+
+        frame = self.padded_frame[:self.screen_height, :self.screen_width]
+        if output is None:
+            return frame
+        np.copyto(output, frame)
+        return output
+
+    def create_glyph_atlas(self):
+        glyphs = load_glyph_atlas(self.ASCII_chars, self.font_size)
+        step = self.char_step
+        blocks_y, blocks_x = -(-glyphs.shape[1] // step), -(-glyphs.shape[2] // step)
+        atlas = np.zeros((len(glyphs), blocks_y * step, blocks_x * step), dtype=bool)
+        # index 0 is never drawn, so its glyph stays empty
+        atlas[1:, :glyphs.shape[1], :glyphs.shape[2]] = glyphs[1:]
+        return atlas
+
+    def create_glyph_blocks(self):
+        step = self.char_step
+        blocks_y, blocks_x = self.glyphs.shape[1] // step, self.glyphs.shape[2] // step
+        return [[np.ascontiguousarray(self.glyphs[:, dy * step:(dy + 1) * step, dx * step:(dx + 1) * step])
+                 for dx in range(blocks_x)] for dy in range(blocks_y)]
+
+    def create_cell_grid(self):
+        step = self.char_step
+        cells_x, cells_y = -(-self.screen_width // step), -(-self.screen_height // step)
+        cell_ids = np.arange(1, cells_y * cells_x + 1, dtype=np.intp).reshape(cells_y, cells_x)
+        cell_ids = cell_ids.repeat(step, axis=0).repeat(step, axis=1)
+        padded_shape = (cells_y + self.blocks_y - 1) * step, (cells_x + self.blocks_x - 1) * step
+        return cell_ids, padded_shape
+
+    def create_buffers(self, cells_shape):
+        cells_y, cells_x = cells_shape
+        step = self.char_step
+        return {'char_ids': np.empty(cells_shape, dtype=np.intp),
+                'blocks': np.empty((cells_y, cells_x, step, step), dtype=bool),
+                'mask': np.empty((cells_y * step, cells_x * step), dtype=bool),
+                'covered': np.empty(self.padded_shape, dtype=bool),
+                'owners': np.empty(self.padded_shape, dtype=np.intp),
+                'colors': np.empty((*self.padded_shape, 3), dtype=np.uint8)}
+
+    def create_frame_buffer(self):
+        # an all-blank grid over a black frame is a valid starting point for the first diff
+        step = self.char_step
+        padded_frame = np.zeros((*self.padded_shape, 3), dtype=np.uint8)
+        tiles_y, tiles_x = self.padded_shape[0] // step, self.padded_shape[1] // step
+        return padded_frame, padded_frame.reshape(tiles_y, step, tiles_x, step, 3)
+
+
+class PixelRenderer:
+
+    def __init__(self, frame_size, pixel_size):
+        self.screen_size = self.screen_width, self.screen_height = frame_size
+        self.pixel_size = pixel_size
+        self.padded_frame, self.cells = self.create_frame_buffer()
+
+    def render(self, colors, output=None):
+        # colors is a (cells_y, cells_x) gray grid or a (cells_y, cells_x, 3) BGR grid
+        cells_y, cells_x = colors.shape[:2]
+        self.cells[:] = colors.reshape(cells_y, 1, cells_x, 1, -1)
+        return self.get_frame(output)
+
+    def render_changed(self, colors, changed, output=None):
+        cell_ys, cell_xs = np.nonzero(changed)
+        channels = colors.shape[2] if colors.ndim == 3 else 1
+        self.cells[cell_ys, :, cell_xs] = colors[changed].reshape(len(cell_ys), 1, 1, channels)
+        return self.get_frame(output)
+
+    def get_frame(self, output=None):
+        frame = self.padded_frame[:self.screen_height, :self.screen_width]
+        if output is None:
+            return frame
+        np.copyto(output, frame)
+        return output
+
+    def create_frame_buffer(self):
+        cells_x, cells_y = -(-self.screen_width // self.pixel_size), -(-self.screen_height // self.pixel_size)
+        frame = np.zeros((cells_y * self.pixel_size, cells_x * self.pixel_size, 3), dtype=np.uint8)
+        cells = frame.reshape(cells_y, self.pixel_size, cells_x, self.pixel_size, 3)
+        return frame, cells
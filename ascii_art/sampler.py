@@ -0,0 +1,46 @@
+import numpy as np
+import cv2
+
+
+SAMPLINGS = ('point', 'area')
+
+
+class CellSampler:
+
+    def __init__(self, step, step_y=None, sampling='point'):
+        if sampling not in SAMPLINGS:
+            raise ValueError(f'sampling must be one of {SAMPLINGS}, not {sampling!r}')
+        self.step = step
+        self.step_y = step_y or step
+        self.sampling = sampling
+
+    def get_grid_size(self, frame_size):
+        width, height = frame_size
+        return -(-width // self.step), -(-height // self.step_y)
+
+    def sample(self, image, cells=None):
+        # point sampling takes the top left pixel of every cell, area sampling the mean of all of them
+        if self.sampling == 'area':
+            return self.sample_area(image, cells)
+        points = image[::self.step_y, ::self.step]
+        if cells is None:
+            return points
+        np.copyto(cells, points)
+        return cells
+
+    def sample_area(self, image, cells=None):
+        height, width = image.shape[:2]
+        cells_x, cells_y = self.get_grid_size((width, height))
+        if cells is None:
+            cells = np.empty((cells_y, cells_x, 3), dtype=np.uint8)
+        # whole cells shrink by an integer factor, which INTER_AREA averages in a single pass; the cells cut off
+        # at the right and bottom edges are averaged over the pixels they have
+        full_x, full_y = width // self.step, height // self.step_y
+        split_x, split_y = full_x * self.step, full_y * self.step_y
+        for top, bottom, first_row, last_row in ((0, split_y, 0, full_y), (split_y, height, full_y, cells_y)):
+            for left, right, first_column, last_column in ((0, split_x, 0, full_x), (split_x, width, full_x, cells_x)):
+                if last_row > first_row and last_column > first_column:
+                    cells[first_row:last_row, first_column:last_column] = cv2.resize(
+                        image[top:bottom, left:right], (last_column - first_column, last_row - first_row),
+                        interpolation=cv2.INTER_AREA)
+        return cells
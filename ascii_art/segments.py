@@ -0,0 +1,109 @@
+import subprocess
+import functools
+import tempfile
+import shutil
+import glob
+import os
+
+from .pipeline import convert_video
+from .pool import call_shared, open_fork_pool
+from .sinks import open_sink
+from .sources import VideoSource
+
+
+def run_ffmpeg(command, action):
+    try:
+        process = subprocess.run(command)
+    except FileNotFoundError:
+        raise OSError(f'{command[0]} was not found, install ffmpeg or pass its path') from None
+    if process.returncode:
+        raise OSError(f'ffmpeg failed to {action} (exit code {process.returncode})')
+
+
+def split_video(path, folder, segments, duration, ffmpeg='ffmpeg'):
+    # a stream copy can only cut at keyframes, so every part starts with one and decodes on its own,
+    # and nothing is decoded or re-encoded to split it
+    command = [ffmpeg, '-y', '-loglevel', 'error', '-i', path, '-map', '0:v:0', '-c', 'copy',
+               '-f', 'segment', '-segment_time', repr(duration / segments), '-segment_format', 'matroska',
+               '-reset_timestamps', '1', os.path.join(folder, 'part%04d.mkv')]
+    run_ffmpeg(command, f'split {path}')
+    return sorted(glob.glob(os.path.join(folder, 'part*.mkv')))
+
+
+def join_video(paths, output_path, audio_path=None, ffmpeg='ffmpeg'):
+    # the parts share their encoder settings, so the concat demuxer can copy them one after another
+    list_path = os.path.join(os.path.dirname(paths[0]), 'parts.txt')
+    with open(list_path, 'w') as file:
+        for path in paths:
+            escaped_path = path.replace("'", "'\\''")
+            file.write(f"file '{escaped_path}'\n")
+    command = [ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', list_path]
+    if audio_path is not None:
+        command += ['-i', audio_path, '-map', '0:v:0', '-map', '1:a:0?', '-c:a', 'copy', '-shortest']
+    command += ['-c:v', 'copy', '-movflags', '+faststart', output_path]
+    run_ffmpeg(command, f'join the parts of {output_path}')
+
+
+class SegmentedConversion:
+
+    def __init__(self, converter, fps, extension, encoder='opencv', preset='veryfast', crf=23, ffmpeg='ffmpeg',
+                 cache=None, cache_key=None):
+        self.converter = converter
+        self.fps = fps
+        self.extension = extension
+        self.encoder, self.preset, self.crf, self.ffmpeg = encoder, preset, crf, ffmpeg
+        self.cache, self.cache_key = cache, cache_key
+        self.part_count = None
+
+    def get_part_key(self, part_index):
+        return self.cache.get_key(self.cache_key, {'part': part_index, 'parts': self.part_count})
+
+    def convert_part(self, part_index, part_path):
+        output_path = os.path.splitext(part_path)[0] + '-art' + self.extension
+        if self.cache is not None and self.cache.get(self.get_part_key(part_index), output_path):
+            source = VideoSource(output_path)
+            source.release()
+            return output_path, source.frame_count
+
+        source = VideoSource(part_path)
+        # matroska parts may report a rounded frame rate, every part is written at the rate of the input
+        source.fps = self.fps
+        sink = open_sink(output_path, source, self.encoder, self.preset, self.crf, False, self.ffmpeg,
+                         self.converter.screen_size)
+        try:
+            frame_count = convert_video(self.converter, source, sink)
+        finally:
+            sink.release()
+            source.release()
+        if self.cache is not None:
+            self.cache.put(self.get_part_key(part_index), output_path)
+        return output_path, frame_count
+
+    def run(self, part_paths):
+        # one process per part inherits the converter; each has its own decoder and encoder
+        self.part_count = len(part_paths)
+        with open_fork_pool(self, len(part_paths)) as pool:
+            results = pool.starmap(functools.partial(call_shared, 'convert_part'), enumerate(part_paths),
+                                   chunksize=1)
+            pool.close()
+            pool.join()
+        return results
+
+
+def convert_segmented(converter, source, output_path, segments, encoder='opencv', preset='veryfast', crf=23,
+                      is_audio=True, ffmpeg='ffmpeg', cache=None, cache_key=None):
+    if source.frame_count <= 0:
+        raise ValueError(f'{source.path} does not report its length and cannot be split into segments')
+    folder = tempfile.mkdtemp(prefix='.ascii-art-', dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        duration = source.frame_count / source.fps
+        part_paths = split_video(source.path, folder, segments, duration, ffmpeg)
+        segmented_conversion = SegmentedConversion(converter, source.fps, os.path.splitext(output_path)[1], encoder,
+                                                   preset, crf, ffmpeg, cache, cache_key)
+        results = segmented_conversion.run(part_paths)
+        # the audio track goes along as it would with a single ffmpeg encoder
+        audio_path = source.path if encoder == 'ffmpeg' and is_audio else None
+        join_video([path for path, _ in results], output_path, audio_path, ffmpeg)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return sum(frame_count for _, frame_count in results)
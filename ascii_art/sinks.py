@@ -0,0 +1,84 @@
+import numpy as np
+import subprocess
+import cv2
+
+from .sources import is_image_path
+
+
+ENCODERS = ('opencv', 'ffmpeg')
+
+
+class VideoSink:
+
+    def __init__(self, path, fps, frame_size):
+        self.path = path
+        self.recorder = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, frame_size)
+
+    def write(self, frame):
+        self.recorder.write(frame)
+
+    def release(self):
+        self.recorder.release()
+
+
+class FFmpegSink:
+
+    def __init__(self, path, fps, frame_size, audio_path=None, preset='veryfast', crf=23, ffmpeg='ffmpeg'):
+        # raw BGR frames go to ffmpeg's stdin; the full float fps lets ffmpeg recover rates like 24000/1001
+        self.path = path
+        width, height = frame_size
+        command = [ffmpeg, '-y', '-loglevel', 'error',
+                   '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-video_size', f'{width}x{height}',
+                   '-framerate', repr(float(fps)), '-i', 'pipe:0']
+        if audio_path is not None:
+            # the '?' keeps inputs without an audio track working; -shortest trims audio to the frames written
+            command += ['-i', audio_path, '-map', '0:v:0', '-map', '1:a:0?', '-c:a', 'copy', '-shortest']
+        if width % 2 or height % 2:
+            # yuv420p needs even dimensions, pad with one black row or column
+            command += ['-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2']
+        command += ['-c:v', 'libx264', '-preset', preset, '-crf', str(crf), '-pix_fmt', 'yuv420p',
+                    '-movflags', '+faststart', path]
+        try:
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        except FileNotFoundError:
+            raise OSError(f'{ffmpeg} was not found, install ffmpeg or pass its path') from None
+
+    def write(self, frame):
+        try:
+            self.process.stdin.write(np.ascontiguousarray(frame).data)
+        except BrokenPipeError:
+            raise OSError(f'ffmpeg stopped while writing {self.path}') from None
+
+    def release(self):
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        if self.process.wait():
+            raise OSError(f'ffmpeg failed to write {self.path} (exit code {self.process.returncode})')
+
+
+class ImageSink:
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, frame):
+        cv2.imwrite(self.path, frame)
+
+    def release(self):
+        pass
+
+
+def open_sink(path, source, encoder='opencv', preset='veryfast', crf=23, is_audio=True, ffmpeg='ffmpeg',
+              frame_size=None):
+    if encoder not in ENCODERS:
+        raise ValueError(f'encoder must be one of {ENCODERS}, not {encoder!r}')
+    if is_image_path(path):
+        return ImageSink(path)
+    fps = source.fps or 25
+    frame_size = frame_size or source.frame_size
+    if encoder == 'ffmpeg':
+        audio_path = source.path if is_audio and not source.is_still and isinstance(source.path, str) else None
+        return FFmpegSink(path, fps, frame_size, audio_path, preset, crf, ffmpeg)
+    return VideoSink(path, fps, frame_size)
@@ -0,0 +1,196 @@
+import threading
+import queue
+import time
+import cv2
+import os
+
+
+IMAGE_EXTENSIONS = ('.bmp', '.jpeg', '.jpg', '.png', '.tif', '.tiff', '.webp')
+
+
+def is_image_path(path):
+    return os.path.splitext(str(path))[1].lower() in IMAGE_EXTENSIONS
+
+
+class VideoSource:
+
+    is_still = False
+
+    def __init__(self, path):
+        self.path = path
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise OSError(f'cannot open video source {path!r}')
+        # webcams and some containers report 0 fps; 25 is what the recorders used before
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 25
+        self.frame_size = (int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                           int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.frame_count = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def read(self, frame=None):
+        ret, frame = self.capture.read(frame)
+        return frame if ret else None
+
+    def release(self):
+        self.capture.release()
+
+
+class ImageSource:
+
+    is_still = True
+    fps = None
+    frame_count = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.image = cv2.imread(path)
+        if self.image is None:
+            raise OSError(f'cannot read image {path!r}')
+        self.frame_size = self.image.shape[1], self.image.shape[0]
+        self.is_read = False
+
+    def read(self, frame=None):
+        if self.is_read:
+            return None
+        self.is_read = True
+        return self.image
+
+    def release(self):
+        pass
+
+
+class PrefetchSource:
+
+    def __init__(self, source, depth=4, prepare=None):
+        # frames are decoded, and handed to prepare if given, on a thread up to depth frames ahead of the reader;
+        # OpenCV releases the GIL while it decodes, so decoding overlaps whatever the reader does meanwhile
+        self.source = source
+        self.path, self.fps, self.frame_size = source.path, source.fps, source.frame_size
+        self.is_still, self.frame_count = source.is_still, source.frame_count
+        self.prepare = prepare
+        self.frames = queue.Queue(depth)
+        # one frame decoding, depth waiting and one held by the reader; their buffers go round and round
+        self.free_frames = queue.Queue()
+        for _ in range(depth + 2):
+            self.free_frames.put(None)
+        self.frame = self.prepared = None
+        self.timings = {}
+        self.is_done = self.is_stopped = False
+        self.thread = threading.Thread(target=self.decode_frames, daemon=True)
+        self.thread.start()
+
+    def decode_frames(self):
+        try:
+            while not self.is_stopped:
+                start_time = time.perf_counter()
+                frame = self.source.read(self.free_frames.get())
+                if frame is None:
+                    break
+                decode_time = time.perf_counter()
+                timings = {'decode': decode_time - start_time}
+                prepared = None
+                if self.prepare is not None:
+                    prepared = self.prepare(frame)
+                    timings['convert'] = time.perf_counter() - decode_time
+                self.frames.put((frame, prepared, timings, None))
+        except Exception as error:
+            self.frames.put((None, None, {}, error))
+            return
+        self.frames.put((None, None, {}, None))
+
+    def read(self, frame=None):
+        # the frame handed out last time goes back to the decoder, so it is only valid until the next read
+        if self.is_done:
+            return None
+        if self.frame is not None:
+            self.free_frames.put(self.frame)
+        self.frame, self.prepared, self.timings, error = self.frames.get()
+        if self.frame is None:
+            self.is_done = True
+        if error is not None:
+            raise error
+        return self.frame
+
+    def close(self):
+        # a decoder blocked on a full queue or on a free buffer is woken up until it sees it should stop
+        self.is_stopped = True
+        self.free_frames.put(None)
+        while self.thread.is_alive():
+            try:
+                self.frames.get_nowait()
+            except queue.Empty:
+                self.thread.join(0.01)
+
+    def release(self):
+        self.close()
+        self.source.release()
+
+
+class LatestFrameSource:
+
+    def __init__(self, source):
+        # the camera is read on a thread as fast as it delivers and only the newest frame is kept, so a reader that
+        # falls behind skips the frames it missed instead of working through a growing backlog
+        self.source = source
+        self.path, self.fps, self.frame_size = source.path, source.fps, source.frame_size
+        self.is_still, self.frame_count = source.is_still, source.frame_count
+        self.condition = threading.Condition()
+        # one frame capturing, the newest one waiting and one held by the reader
+        self.free_frames = [None, None, None]
+        self.latest = None
+        self.frame = self.capture_time = None
+        self.dropped_count = 0
+        self.error = None
+        self.is_done = self.is_stopped = False
+        self.thread = threading.Thread(target=self.capture_frames, daemon=True)
+        self.thread.start()
+
+    def capture_frames(self):
+        try:
+            while not self.is_stopped:
+                with self.condition:
+                    frame = self.free_frames.pop()
+                frame = self.source.read(frame)
+                capture_time = time.perf_counter()
+                with self.condition:
+                    if frame is None:
+                        break
+                    if self.latest is not None:
+                        self.free_frames.append(self.latest[0])
+                        self.dropped_count += 1
+                    self.latest = frame, capture_time
+                    self.condition.notify()
+        except Exception as error:
+            self.error = error
+        with self.condition:
+            self.is_done = True
+            self.condition.notify()
+
+    def read(self, frame=None):
+        # waits for a frame newer than the last one read; capture_time is when it left the camera driver
+        with self.condition:
+            if self.frame is not None:
+                self.free_frames.append(self.frame)
+                self.frame = None
+            while self.latest is None and not self.is_done:
+                self.condition.wait()
+            if self.latest is None:
+                if self.error is not None:
+                    raise self.error
+                return None
+            (self.frame, self.capture_time), self.latest = self.latest, None
+            return self.frame
+
+    def close(self):
+        self.is_stopped = True
+        self.thread.join()
+
+    def release(self):
+        self.close()
+        self.source.release()
+
+
+def open_source(path):
+    if path == 'webcam':
+        return VideoSource(0)
+    return ImageSource(path) if is_image_path(path) else VideoSource(path)
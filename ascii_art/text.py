@@ -0,0 +1,167 @@
+import numpy as np
+import time
+import sys
+import cv2
+
+from .converter import COLOR_CHARS, COLORS, GRAY_CHARS
+from .quantizer import ColorQuantizer, create_char_lut
+from .sampler import CellSampler
+
+
+TEXT_FORMATS = ('plain', '256', 'truecolor')
+RESET = '\x1b[0m'
+# the six levels of the xterm 256-colour cube
+CUBE_LEVELS = np.array([0, 95, 135, 175, 215, 255])
+
+
+class TextRenderer:
+
+    def __init__(self, chars, text_format, gamma=1.0):
+        if text_format not in TEXT_FORMATS:
+            raise ValueError(f'text format must be one of {TEXT_FORMATS}, not {text_format!r}')
+        self.ASCII_chars = chars
+        self.char_lut = create_char_lut(len(chars), gamma)
+        self.char_table = np.array(list(chars))
+        self.is_blank = np.array([char.isspace() for char in chars])
+        self.text_format = text_format
+        self.cube_lut = np.abs(np.arange(256)[:, None] - CUBE_LEVELS).argmin(axis=1)
+        self.escapes = {}
+
+    def get_char_indices(self, gray_cells):
+        return cv2.LUT(gray_cells, self.char_lut)
+
+    def get_color_codes(self, colors):
+        colors = colors.astype(np.int32)
+        blue, green, red = colors[:, :, 0], colors[:, :, 1], colors[:, :, 2]
+        if self.text_format == 'truecolor':
+            return red << 16 | green << 8 | blue
+        cube = self.cube_lut
+        return 16 + 36 * cube[red] + 6 * cube[green] + cube[blue]
+
+    def get_escape(self, code):
+        escape = self.escapes.get(code)
+        if escape is None:
+            if self.text_format == 'truecolor':
+                escape = f'\x1b[38;2;{code >> 16};{code >> 8 & 255};{code & 255}m'
+            else:
+                escape = f'\x1b[38;5;{code}m'
+            self.escapes[code] = escape
+        return escape
+
+    def render(self, char_indices, colors=None):
+        # the rows of a contiguous (cells_y, cells_x) grid of single characters read as cells_y strings
+        cells_y, cells_x = char_indices.shape
+        grid = np.ascontiguousarray(self.char_table[char_indices])
+        lines = grid.view(f'<U{cells_x}')[:, 0].tolist()
+        if colors is None or self.text_format == 'plain':
+            return lines
+
+        # whitespace shows no colour, so it carries on the span before it and only colour changes are escaped;
+        # every other character, the first of the charset included, is printed in the colour of its cell
+        codes = self.get_color_codes(colors)
+        is_drawn = ~self.is_blank[char_indices]
+        rows, columns = np.arange(cells_y)[:, None], np.where(is_drawn, np.arange(cells_x), 0)
+        np.maximum.accumulate(columns, axis=1, out=columns)
+        codes = np.where(is_drawn[rows, columns], codes[rows, columns], -1)
+        is_span_start = np.ones(codes.shape, dtype=bool)
+        is_span_start[:, 1:] = codes[:, 1:] != codes[:, :-1]
+
+        colored_lines = []
+        for line, line_codes, span_starts in zip(lines, codes.tolist(), is_span_start):
+            starts = np.flatnonzero(span_starts).tolist()
+            pieces = []
+            for start, end in zip(starts, starts[1:] + [cells_x]):
+                code = line_codes[start]
+                if code >= 0:
+                    pieces.append(self.get_escape(code))
+                pieces.append(line[start:end])
+            pieces.append(RESET)
+            colored_lines.append(''.join(pieces))
+        return colored_lines
+
+
+class TextConverter:
+
+    def __init__(self, frame_size, color='rgb', font_size=12, color_lvl=8, chars=None, text_format='truecolor',
+                 columns=None, sampling='point', gamma=1.0):
+        if color not in COLORS:
+            raise ValueError(f'color must be one of {COLORS}, not {color!r}')
+        self.screen_size = self.screen_width, self.screen_height = frame_size
+        self.is_color = color == 'rgb' and text_format != 'plain'
+        self.quantizer = ColorQuantizer(color_lvl) if self.is_color else None
+        chars = chars or (COLOR_CHARS if color == 'rgb' else GRAY_CHARS)
+        self.renderer = TextRenderer(chars, text_format, gamma)
+        # terminal cells are about twice as tall as they are wide
+        char_step = -(-self.screen_width // columns) if columns else int(font_size * 0.6)
+        self.sampler = CellSampler(char_step, 2 * char_step, sampling)
+
+    def convert_frame(self, cv2_image, output=None, profiler=None):
+        if profiler is None:
+            return self.render_cells(self.get_cells(cv2_image))
+        start_time = time.perf_counter()
+        cells = self.get_cells(cv2_image)
+        start_time = profiler.record('convert', start_time)
+        lines = self.render_cells(cells)
+        profiler.record('render', start_time)
+        return lines
+
+    def get_cells(self, cv2_image):
+        cells = np.ascontiguousarray(self.sampler.sample(cv2_image))
+        gray_cells = cv2.cvtColor(cells, cv2.COLOR_BGR2GRAY)
+        colors = self.quantizer.quantize(cells) if self.is_color else None
+        return cells, gray_cells, colors
+
+    def render_cells(self, sampled_cells, output=None):
+        _, gray_cells, colors = sampled_cells
+        return self.renderer.render(self.renderer.get_char_indices(gray_cells), colors)
+
+    def create_frame(self):
+        # frames are lists of lines, built fresh every time
+        return None
+
+
+class TextSink:
+
+    def __init__(self, path=None, is_diff=None, fps=None):
+        self.path = path
+        self.is_stdout = path in (None, '-')
+        self.file = sys.stdout if self.is_stdout else open(path, 'w', encoding='utf-8')
+        # a terminal gets the frames drawn in place, a file or pipe gets them one after another
+        self.is_diff = self.file.isatty() if is_diff is None else is_diff
+        self.frame_time = 1 / fps if fps else None
+        self.next_frame_time = None
+        self.lines = None
+
+    def wait_for_frame(self):
+        now = time.perf_counter()
+        if self.next_frame_time is None:
+            self.next_frame_time = now
+        elif self.next_frame_time > now:
+            time.sleep(self.next_frame_time - now)
+        self.next_frame_time += self.frame_time
+
+    def write(self, lines):
+        if self.frame_time is not None:
+            self.wait_for_frame()
+        if not self.is_diff:
+            self.file.write('\n'.join(lines) + '\n\n')
+        else:
+            # move to each changed line, rewrite it and clear what the old line left behind
+            if self.lines is None:
+                pieces = ['\x1b[?25l\x1b[2J']
+                self.lines = [None] * len(lines)
+            else:
+                pieces = []
+            for row, (line, old_line) in enumerate(zip(lines, self.lines)):
+                if line != old_line:
+                    pieces.append(f'\x1b[{row + 1}H{line}\x1b[K')
+            self.lines = lines
+            self.file.write(''.join(pieces))
+        self.file.flush()
+
+    def release(self):
+        if self.is_diff and self.lines is not None:
+            self.file.write(f'{RESET}\x1b[{len(self.lines) + 1}H\x1b[?25h')
+            self.file.flush()
+        if not self.is_stdout:
+            self.file.close()
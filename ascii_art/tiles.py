@@ -0,0 +1,190 @@
+import numpy as np
+import collections
+import struct
+import zlib
+import cv2
+import os
+
+from .pool import call_shared, open_fork_pool
+
+
+STRIP_EXTENSIONS = ('.png', '.ppm', '.pnm', '.npy')
+# input rows, output rows and the renderer's owner map and masks, per output pixel
+BYTES_PER_PIXEL = 16
+
+
+def read_ppm_header(file):
+    # P6 header: magic, width, height and maxval separated by whitespace, comments start with '#'
+    fields = []
+    while len(fields) < 4:
+        line = file.readline()
+        if not line:
+            raise ValueError('truncated PPM header')
+        fields += line.split(b'#')[0].split()
+    if fields[0] != b'P6' or int(fields[3]) != 255:
+        raise ValueError('only binary 8-bit PPM (P6, maxval 255) can be memory-mapped')
+    return int(fields[1]), int(fields[2]), file.tell()
+
+
+def open_image(path):
+    # uncompressed formats are memory-mapped, so only the rows that get sampled are ever read;
+    # anything else has to be decoded whole by OpenCV
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.npy':
+        return np.load(path, mmap_mode='r')
+    if extension in ('.ppm', '.pnm'):
+        with open(path, 'rb') as file:
+            width, height, offset = read_ppm_header(file)
+        return np.memmap(path, dtype=np.uint8, mode='r', offset=offset, shape=(height, width, 3))[:, :, ::-1]
+    if extension == '.bmp':
+        with open(path, 'rb') as file:
+            header = file.read(54)
+        offset, = struct.unpack_from('<I', header, 10)
+        width, height = struct.unpack_from('<ii', header, 18)
+        bits, compression = struct.unpack_from('<HI', header, 28)
+        if bits == 24 and compression == 0:
+            stride = (width * 3 + 3) & ~3
+            rows = np.memmap(path, dtype=np.uint8, mode='r', offset=offset, shape=(abs(height), stride))
+            image = np.lib.stride_tricks.as_strided(rows, (abs(height), width, 3), (stride, 3, 1), writeable=False)
+            # positive heights are stored bottom-up
+            return image[::-1] if height > 0 else image
+    image = cv2.imread(path)
+    if image is None:
+        raise OSError(f'cannot read image {path!r}')
+    return image
+
+
+class PngStripWriter:
+
+    def __init__(self, path, frame_size, compression=1):
+        self.file = open(path, 'wb')
+        self.width, height = frame_size
+        self.file.write(b'\x89PNG\r\n\x1a\n')
+        self.write_chunk(b'IHDR', struct.pack('>IIBBBBB', self.width, height, 8, 2, 0, 0, 0))
+        self.compressor = zlib.compressobj(compression)
+
+    def write_chunk(self, kind, data):
+        self.file.write(struct.pack('>I', len(data)) + kind)
+        self.file.write(data)
+        self.file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind))))
+
+    def write(self, rows):
+        # every scanline starts with filter type 0 and holds RGB
+        scanlines = np.zeros((len(rows), 1 + 3 * self.width), dtype=np.uint8)
+        scanlines[:, 1:] = rows[:, :, ::-1].reshape(len(rows), -1)
+        data = self.compressor.compress(scanlines)
+        if data:
+            self.write_chunk(b'IDAT', data)
+
+    def release(self):
+        self.write_chunk(b'IDAT', self.compressor.flush())
+        self.write_chunk(b'IEND', b'')
+        self.file.close()
+
+
+class PpmStripWriter:
+
+    def __init__(self, path, frame_size):
+        self.file = open(path, 'wb')
+        self.file.write(b'P6\n%d %d\n255\n' % frame_size)
+
+    def write(self, rows):
+        self.file.write(np.ascontiguousarray(rows[:, :, ::-1]).data)
+
+    def release(self):
+        self.file.close()
+
+
+class NpyStripWriter:
+
+    def __init__(self, path, frame_size):
+        width, height = frame_size
+        self.image = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8, shape=(height, width, 3))
+        self.row = 0
+
+    def write(self, rows):
+        self.image[self.row:self.row + len(rows)] = rows
+        self.row += len(rows)
+
+    def release(self):
+        self.image.flush()
+        del self.image
+
+
+def open_strip_writer(path, frame_size):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.png':
+        return PngStripWriter(path, frame_size)
+    if extension in ('.ppm', '.pnm'):
+        return PpmStripWriter(path, frame_size)
+    if extension == '.npy':
+        return NpyStripWriter(path, frame_size)
+    raise ValueError(f'tiled output must be one of {STRIP_EXTENSIONS}, not {extension!r}')
+
+
+class TiledConversion:
+
+    def __init__(self, image, create_converter, memory_budget=256 * 2 ** 20, workers=1, strip_rows=None):
+        self.image = image
+        self.frame_height, self.frame_width = image.shape[:2]
+        self.frame_size = self.frame_width, self.frame_height
+        self.create_converter = create_converter
+        self.converters = {}
+        probe = create_converter((self.frame_width, 1))
+        self.step = probe.sampler.step
+        # glyphs reach into the cell rows below them, so a strip is rendered together with the cell rows above
+        # it whose glyphs can overlap it, and those rows are cut off again
+        self.overlap_rows = getattr(probe.renderer, 'blocks_y', 1) - 1
+        self.cells_y = -(-self.frame_height // self.step)
+        if strip_rows is None:
+            # every worker can hold a strip it converts and one waiting to be written
+            strip_bytes = memory_budget // (2 * workers)
+            strip_rows = strip_bytes // (BYTES_PER_PIXEL * self.frame_width * self.step) - self.overlap_rows
+        self.strip_rows = max(1, strip_rows)
+        self.strip_count = -(-self.cells_y // self.strip_rows)
+
+    def get_converter(self, frame_size):
+        converter = self.converters.get(frame_size)
+        if converter is None:
+            converter = self.converters[frame_size] = self.create_converter(frame_size)
+        return converter
+
+    def convert_strip(self, strip_index):
+        first_row = strip_index * self.strip_rows
+        last_row = min(first_row + self.strip_rows, self.cells_y)
+        top = max(first_row - self.overlap_rows, 0) * self.step
+        start, end = first_row * self.step, min(last_row * self.step, self.frame_height)
+        converter = self.get_converter((self.frame_width, end - top))
+        frame = converter.convert_frame(self.image[top:end])
+        return np.array(frame[start - top:])
+
+    def run(self, writer, workers=1):
+        if workers <= 1:
+            for strip_index in range(self.strip_count):
+                writer.write(self.convert_strip(strip_index))
+            return self.strip_count
+
+        # the workers inherit the image mapping and the converter factory; strips are written in order and
+        # at most two per worker are in flight
+        with open_fork_pool(self, workers) as pool:
+            pending = collections.deque()
+            for strip_index in range(self.strip_count):
+                if len(pending) == 2 * workers:
+                    writer.write(pending.popleft().get())
+                pending.append(pool.apply_async(call_shared, ('convert_strip', strip_index)))
+            while pending:
+                writer.write(pending.popleft().get())
+            pool.close()
+            pool.join()
+        return self.strip_count
+
+
+def convert_tiled(input_path, output_path, create_converter, memory_budget=256 * 2 ** 20, workers=1,
+                  strip_rows=None):
+    image = open_image(input_path)
+    tiled_conversion = TiledConversion(image, create_converter, memory_budget, workers, strip_rows)
+    writer = open_strip_writer(output_path, tiled_conversion.frame_size)
+    try:
+        return tiled_conversion.run(writer, workers)
+    finally:
+        writer.release()
@@ -0,0 +1,144 @@
+import pygame as pg
+import time
+import cv2
+
+from .pipeline import get_prepare
+from .sinks import VideoSink
+from .sources import LatestFrameSource, PrefetchSource
+
+
+class Viewer:
+
+    def __init__(self, source, converter, save_path, record_path=None, is_sound=False, profiler=None, prefetch=0,
+                 controller=None):
+        pg.init()
+        self.source = source
+        if prefetch and not source.is_still:
+            self.source = PrefetchSource(source, prefetch, get_prepare(converter))
+        self.converter = converter
+        self.screen_size = self.screen_width, self.screen_height = converter.screen_size
+        self.surface = pg.display.set_mode(self.screen_size)
+        self.clock = pg.time.Clock()
+        self.frame = converter.create_frame()
+        self.cv2_image = None
+        self.profiler = profiler
+        # live mode: a LatestFrameSource and a controller that trades cell size for frame time
+        self.controller = controller
+        self.work_start = self.latency = None
+        self.dropped_count = 0
+
+        self.save_path = save_path
+        self.record_path = record_path
+        self.record = False
+        self.recorder = None
+        if is_sound and not source.is_still and isinstance(source.path, str):
+            from ffpyplayer.player import MediaPlayer
+            self.player = MediaPlayer(source.path)
+
+    def show_frame(self):
+        pixels = pg.surfarray.pixels3d(self.surface)
+        pixels[:] = self.frame.transpose(1, 0, 2)[:, :, ::-1]
+
+    def record_frame(self):
+        if self.record:
+            start_time = time.perf_counter()
+            if self.recorder is None:
+                self.recorder = VideoSink(self.record_path, self.source.fps, self.screen_size)
+            self.recorder.write(self.frame)
+            cv2.imshow('Frame', self.frame)
+            if cv2.waitKey(1) & 0xFF == 27:
+                self.record = not self.record
+                cv2.destroyAllWindows()
+            if self.profiler is not None:
+                self.profiler.record('record', start_time)
+
+    def draw_converted_image(self):
+        if self.source.is_still and self.cv2_image is not None:
+            return True
+        start_time = time.perf_counter()
+        cv2_image = self.source.read()
+        if cv2_image is None:
+            return False
+        self.work_start = time.perf_counter()
+        is_prefetched = isinstance(self.source, PrefetchSource)
+        if self.profiler is not None:
+            # a source decoding on its own thread only holds this one up while no frame is ready yet
+            is_threaded = is_prefetched or isinstance(self.source, LatestFrameSource)
+            start_time = self.profiler.record('wait' if is_threaded else 'decode', start_time)
+            if is_prefetched:
+                for stage, seconds in self.source.timings.items():
+                    self.profiler.add(stage, seconds)
+        self.cv2_image = cv2_image
+        if is_prefetched and self.source.prepared is not None:
+            self.converter.render_cells(self.source.prepared, self.frame)
+            if self.profiler is not None:
+                self.profiler.record('render', start_time)
+        else:
+            self.converter.convert_frame(cv2_image, self.frame, self.profiler)
+        start_time = time.perf_counter()
+        self.show_frame()
+        if self.profiler is not None:
+            self.profiler.record('display', start_time)
+        return True
+
+    def update_live(self):
+        # latency runs from the camera driver handing the frame over to the flip that put it on screen
+        now = time.perf_counter()
+        self.latency = now - self.source.capture_time
+        self.converter = self.controller.update(now - self.work_start)
+        dropped_count, self.dropped_count = self.source.dropped_count - self.dropped_count, self.source.dropped_count
+        if self.profiler is not None:
+            self.profiler.add('latency', self.latency)
+            self.profiler.increment('dropped_frames', dropped_count)
+            self.profiler.set_gauge('cell_size', self.controller.size)
+
+    def get_caption(self):
+        caption = str(round(self.clock.get_fps()))
+        if self.controller is not None and self.latency is not None:
+            caption += f' fps, {1000 * self.latency:.0f} ms latency, size {self.controller.size}'
+        return caption
+
+    def save_image(self):
+        cv2.imwrite(self.save_path, self.frame)
+
+    def draw_cv2_image(self):
+        resized_cv2_image = cv2.resize(self.cv2_image, (self.screen_width//4, self.screen_height//4),
+                                       interpolation=cv2.INTER_AREA)
+        cv2.imshow('img', resized_cv2_image)
+
+    def draw(self):
+        if not self.draw_converted_image():
+            return False
+        self.draw_cv2_image()
+        return True
+
+    def run(self):
+        try:
+            while True:
+                for event in pg.event.get():
+                    if event.type == pg.QUIT:
+                        return
+                    elif event.type == pg.KEYDOWN:
+                        if event.key == pg.K_s:
+                            self.save_image()
+                        if event.key == pg.K_r and self.record_path:
+                            self.record = not self.record
+
+                self.record_frame()
+                if not self.draw():
+                    return
+                pg.display.set_caption(self.get_caption())
+                pg.display.flip()
+                if self.controller is not None:
+                    self.update_live()
+                self.clock.tick()
+                if self.profiler is not None:
+                    self.profiler.end_frame()
+        finally:
+            if isinstance(self.source, (LatestFrameSource, PrefetchSource)):
+                self.source.close()
+            if self.recorder is not None:
+                self.recorder.release()
+            if self.profiler is not None and self.profiler.path:
+                self.profiler.dump()
+            pg.quit()